@@ -1,8 +1,21 @@
-import serial, sys
+import serial, sys, time
 from pyqtgraph.Qt import QtCore, QtWidgets
 import pyqtgraph as pg
 import numpy as np
-import numpy.fft as fft
+import frameDecoder, adcConverter, measurements
+from adcConverter import AdcConverter
+from traceBuffer import TraceBuffer, EnvelopeDecimator
+from acquisition import SampleRing, AcquisitionWorker, MultiSourceAcquisition
+from measurements import WindowStats, FrequencyEstimator, MetricsPublisher
+from mathChannels import MathChannel
+from capture import CaptureWriter, ReplayStream
+from networkStream import SocketStream
+from trigger import EdgeTrigger, MemoryCapture
+from devices import make_serial_port
+from instrumentation import Profiler
+from sharedRing import SharedRingPublisher
+from dspWorker import DspWorker
+from spectrumAnalyzer import SpectrumAnalyzer
 
 class BasePlot(object):
     def __init__(self, app, stream, n_plots, **kwargs):
@@ -14,6 +27,7 @@ class BasePlot(object):
 
         self.scatter_plot_list = list()
         self.plots = dict()
+        self.decimators = list() # Envolvente de cada grafica
 
         self.ENCODING = "utf-8"
         self.SPLIT_CHAR = ","
@@ -24,10 +38,17 @@ class BasePlot(object):
         self.A_MINUS_B = 2
         self.A_X_B = 3
         self.A_DIV_B = 4
-        self.IN_MIN = 0
-        self.IN_MAX = 4095
-        self.OUT_MIN = -3.6
-        self.OUT_MAX = 3.4
+        self.EXPRESSION = 5
+        self.MATH_OPERATIONS = {
+            self.A_PLUS_B: "+",
+            self.A_MINUS_B: "-",
+            self.A_X_B: "*",
+            self.A_DIV_B: "/",
+        }
+        self.IN_MIN = adcConverter.IN_MIN
+        self.IN_MAX = adcConverter.IN_MAX
+        self.OUT_MIN = adcConverter.OUT_MIN
+        self.OUT_MAX = adcConverter.OUT_MAX
         self.SAMPLES = 7001
         self.AMP_RANGES = [1, 10, 20, 30, 40, 50, 60, 70, 80]
         self.TIME_RANGES = [10, 1000, 2000, 3000, 4000, 5000]
@@ -36,31 +57,115 @@ class BasePlot(object):
         self.AMP_TEXTS = ["10mV", "20mV", "50mv", "100mV", "200mV", "500mV", "1V", "2V", "3V"]
         self.TIME_TEXTS = ["50ms", "20ms", "10ms", "5ms", "2ms", "1ms"]
         self.CURVE_WIDTH_SENSIBILITY = 5
-        self.MAX_POINTS_IN_LIST = 1024
-        self.FFT_THRESHOLD = 0.3
-        self.BYTE_ORDER = "little"
-        self.BYTES_SERIAL_READ = 100
+        self.MAX_POINTS_IN_LIST = measurements.WINDOW
+        self.SAMPLE_RATE = measurements.SAMPLE_RATE
+        self.FFT_EVERY_SAMPLES = measurements.FFT_EVERY_SAMPLES
+        self.FFT_EVERY_MS = measurements.FFT_EVERY_MS
+        self.METRICS_EVERY_MS = 250 # Cadencia de los indicadores del panel
+        self.BYTE_ORDER = frameDecoder.BYTE_ORDER
+        self.PROTOCOLS = frameDecoder.PROTOCOLS
+        self.BYTES_SERIAL_READ = frameDecoder.BYTES_SERIAL_READ
+        # Los valores por defecto se comparten con headless.py
+        self.RENDER_LOAD = 0.5 # Fraccion maxima del tiempo dedicada a redibujar
+        self.RING_FRAMES = 1 << 16
+        self.MIN_DECIMATION_COLUMNS = 100
+        self.TRIGGER_OFF = 0
+        self.TRIGGER_AUTO = 1
+        self.TRIGGER_NORMAL = 2
+        self.TRIGGER_SINGLE = 3
+        self.TRIGGER_HYSTERESIS = 0.05
+        self.AUTO_TRIGGER_MS = 100 # Sin disparos durante este tiempo, el modo auto corre libre
+        self.TRIGGER_QUEUE = 16 # Disparos pendientes de completar
+        self.MEMORY_PRE_TRIGGER = 0.25 # Historial previo, relativo al largo de la captura
+        self.HUD_EVERY_MS = 500 # Cadencia del resumen de instrumentacion en pantalla
+        self.DSP_EVERY_MS = 100 # Cadencia de los resultados del proceso de DSP
+        self.SPECTRUM_SIZE = 4096 # Muestras por segmento del espectro
+        self.SPECTRUM_EVERY_MS = 100 # Cadencia del espectro en pantalla
 
         self.timer = None # Para parar el muestreo
+        self.render_timer = None # Refresco de las graficas
+        self.fps = 30
+        self.dirty = False # Hay muestras nuevas sin dibujar
+        self.next_render = 0
+        self.dropped_frames = 0
+        self.threaded = False # Lectura del stream en un hilo aparte
+        self.worker = None
+        self.recorder = None # Grabacion de las tramas en disco
+        self.shared_ring = None # Publicacion de las tramas en memoria compartida
+        self.dsp_process = False # Analisis en otro proceso, con la opcion "dsp_process"
+        self.dsp = None
+        self.dsp_window = self.MAX_POINTS_IN_LIST
+        self.dsp_analyses = list() # Funciones adicionales para el proceso de DSP
+        self.profiler = None # Instrumentacion, solo con la opcion "profile"
+        self.profile_path = None # Archivo donde se guarda al cerrar
+        self.hud = None # Resumen de la instrumentacion sobre las graficas
+        self.next_hud = 0
+        self.rendered_total = 0 # Muestras de la traza ya dibujadas
         self.inverted = [False for _ in range(self.n_plots)]
         self.grid = [True for _ in range(self.n_plots)]
         self.pointsSize = 7
-        self.fft_mode = False
+        self.fft_mode = False # Vista del espectro visible
+        self.spectrum_view = None
+        self.spectrum_curves = list() # Espectro, peak hold y max hold de cada canal
+        self.spectrum_hold = {"peak": True, "max": False}
         self.last_name = "" # Recuerda el nombre del ultimo plot dibujado
         self.point_color_index = -1 # -1 para que el conteo arranque en 0
         self.limit_scatter_points = 10
         self.mode = self.SIMPLE
+        self.math_expression = "(A - B) * 0.5" if self.n_plots > 1 else "A"
+        self.math_plot = None # Grafica del canal derivado
+        self.math_visible = False
         self.tolerance = 0.1
         self.buttonPanel = None
         self.verbose = False
         self.memory_mode = False
         self.memory_mode_time = 0
-        self.channel_data = list()
+        self.memory_capture = None # Captura en curso del modo memoria
+        self.memory_record = None # Ultimo registro capturado, por canal
+        self.memory_x = None
+        self.memory_version = 0
         self.xlim = 0
-        self.points = [np.zeros(self.MAX_POINTS_IN_LIST) for _ in range(self.n_plots)]
-        self.points_pointer = 0
+        self.visible_band = self.TIME_BAND[0] # Muestras visibles en la escala actual
+        self.trigger = EdgeTrigger(hysteresis=self.TRIGGER_HYSTERESIS)
+        self.trigger_mode = self.TRIGGER_OFF
+        self.trigger_source = 0
+        self.trigger_candidates = list() # Disparos pendientes, del mas viejo al mas nuevo
+        self.trigger_snapshot = None # Trazas congeladas en el ultimo disparo
+        self.trigger_x = None
+        self.trigger_version = 0
+        self.last_trigger_total = 0
+        self.trigger_line = None
+        self.stats = WindowStats(self.n_plots, self.MAX_POINTS_IN_LIST)
+        self.frequency = FrequencyEstimator(
+            self.n_plots,
+            self.MAX_POINTS_IN_LIST,
+            self.SAMPLE_RATE,
+            every_samples=self.FFT_EVERY_SAMPLES,
+            every_ms=self.FFT_EVERY_MS
+        )
         self.freqs_lists = list()
         self.peaks_lists = list()
+        self.measurements = dict()
+        self.metrics = MetricsPublisher(self.METRICS_EVERY_MS)
+        self.metrics.subscribe(self._show_metrics)
+        # Los indicadores se actualizan a una cadencia legible
+        self.protocol = kwargs.get("protocol", "raw")
+        if self.protocol not in self.PROTOCOLS:
+            raise ValueError(f"Unknown protocol: {self.protocol}")
+        self.decoder = self._make_decoder()
+        self.converter = AdcConverter(self.n_plots, self.IN_MIN, self.IN_MAX, self.OUT_MIN, self.OUT_MAX)
+        self.math = MathChannel(self.n_plots)
+        self.trace = TraceBuffer(self.n_plots + 1, self.SAMPLES)
+        # La ultima fila de la traza corresponde al canal derivado
+        self.ring = SampleRing(self.RING_FRAMES, self.n_plots)
+        self.spectrum_options = {
+            "size": self.SPECTRUM_SIZE,
+            "window": kwargs.get("spectrum_window", "hann"),
+            "averaging": kwargs.get("spectrum_averaging", "exponential"),
+            "every_ms": self.SPECTRUM_EVERY_MS,
+        }
+        self.analyzer = SpectrumAnalyzer(self.n_plots, sample_rate=self.SAMPLE_RATE, **self.spectrum_options)
+        # El proceso de DSP usa las mismas opciones
 
         self.initUI()
 
@@ -88,8 +193,9 @@ class BasePlot(object):
 
         proxy_close_btn.setWidget(button)
 
-        self.layout.addItem(proxy_controls_btn, row=len(self.plots) + 1, col=0)
-        self.layout.addItem(proxy_close_btn, row=len(self.plots) + 1, col=1)
+        self.layout.addItem(proxy_controls_btn, row=len(self.plots) + 2, col=0)
+        self.layout.addItem(proxy_close_btn, row=len(self.plots) + 2, col=1)
+        # La fila anterior queda reservada para el canal derivado
 
     def _toggle_controls(self):
         self.buttonPanel.change_visibility()
@@ -132,6 +238,22 @@ class BasePlot(object):
     def get_peaks(self):
         return self.peaks_lists
 
+    def set_sample_rate(self, sample_rate):
+        """
+        Define la frecuencia de muestreo de cada canal, en Hz.
+        """
+        self.SAMPLE_RATE = sample_rate
+        self.frequency.set_sample_rate(sample_rate)
+        self.analyzer.set_sample_rate(sample_rate)
+        if self.spectrum_view is not None:
+            self.spectrum_view.setXRange(0, sample_rate / 2)
+
+    def get_measurements(self):
+        """
+        Devuelve Vp, Vpp, valor medio y valor eficaz de cada canal.
+        """
+        return self.measurements
+
     def _set_options(self, plot, **kwargs):
         """
         Configura un conjunto de opciones, algunas definidas
@@ -173,93 +295,266 @@ class BasePlot(object):
         if "verbose" in options:
             self.verbose = kwargs["verbose"]
 
+        if "profile" in options and kwargs["profile"] and self.profiler is None:
+            self.profiler = Profiler()
+            if isinstance(kwargs["profile"], str):
+                self.profile_path = kwargs["profile"]
+        # Con una ruta, la instrumentacion se guarda ahi al cerrar
+
+        if "sample_rate" in options:
+            self.set_sample_rate(kwargs["sample_rate"])
+
+        if "shared_memory" in options and kwargs["shared_memory"]:
+            name = kwargs["shared_memory"]
+            self.start_shared_memory(name if isinstance(name, str) else None)
+        # Con un texto se usa como nombre del segmento
+
+        if "dsp_process" in options:
+            self.dsp_process = kwargs["dsp_process"]
+
+        if "dsp_window" in options:
+            self.dsp_window = kwargs["dsp_window"]
+        # Fuera de la interfaz se puede medir sobre ventanas mas largas
+
+        if "dsp_analyses" in options:
+            self.dsp_analyses = list(kwargs["dsp_analyses"])
+        # Funciones de nivel de modulo f(points, sample_rate) -> dict
+
+        if "fps" in options:
+            self.fps = kwargs["fps"]
+
+        if "threaded" in options:
+            self.threaded = kwargs["threaded"]
+
+    def _make_decoder(self):
+        """
+        Crea el decodificador del protocolo elegido con la opcion
+        "protocol".
+        """
+        return self.PROTOCOLS[self.protocol](self.n_plots, self.IN_MIN, self.IN_MAX, self.BYTE_ORDER)
+
+    def get_streams(self):
+        """
+        Devuelve los streams de los que se adquiere.
+        """
+        return [self.stream]
+
     def _open_stream(self):
         """
         Abre la comunicacion serie.
         """
         print("Opening Stream")
-        self.stream.open()
+        for stream in self.get_streams():
+            stream.open()
 
     def _close_stream(self):
         """
         Cierra la comunicacion serie.
         """
-        try:
-            if hasattr(self.stream, 'flushInput'):
-                self.stream.flushInput()
-            if hasattr(self.stream, 'flushOutput'):
-                self.stream.flushOutput()
-        except serial.serialutil.PortNotOpenError as e:
-            print(e)
-
-        self.stream.close()
+        for stream in self.get_streams():
+            try:
+                if hasattr(stream, 'flushInput'):
+                    stream.flushInput()
+                if hasattr(stream, 'flushOutput'):
+                    stream.flushOutput()
+            except serial.serialutil.PortNotOpenError as e:
+                print(e)
+
+            stream.close()
         print("Stream closed")
 
-    def add_array(self, point):
-        for i in range(self.n_plots):
-            self.points[i][self.points_pointer] = point[i]
+    def add_array(self, points):
+        """
+        Agrega un lote de (n_samples, n_plots) tensiones a la ventana de
+        medicion. Las estadisticas se actualizan de forma incremental.
+        Con el proceso de DSP las mediciones se hacen alla, ver _poll_dsp.
+        """
+        if self.dsp is not None:
+            return
 
-        self.points_pointer = (self.points_pointer + 1) % self.MAX_POINTS_IN_LIST
+        self.stats.extend(points)
 
-        self.peaks_lists = list()
-        self.freqs_lists = list()
-        for i in range(self.n_plots):
-            self.peaks_lists.append(self.points[i].max())
+        self.measurements = self.stats.get_measurements()
+        self.peaks_lists = list(self.measurements["vp"])
 
-            spectrum = fft.fft(self.points[i])
-            freq = fft.fftfreq(len(spectrum))
-            threshold = self.FFT_THRESHOLD * max(abs(spectrum))
-            mask = abs(spectrum) > threshold
-            if len(freq[mask]) > 0:
-                self.freqs_lists.append(freq[mask][0])
-            # Obtiene la frecuencia dominante
+        self.freqs_lists = list(self.frequency.update(self.stats, len(points)))
+        # La frecuencia dominante solo se recalcula segun la cadencia
 
-        self.buttonPanel.update_peaks(self.peaks_lists)
-        self.buttonPanel.update_freqs(self.freqs_lists)
+        self.metrics.update(self.measurements)
+        self.metrics.update({"freq": self.freqs_lists})
+        # El panel se actualiza desde _render, ver _show_metrics
 
-    def _translate(self, data, in_min, in_max, out_min, out_max):
+    def _poll_dsp(self):
+        """
+        Toma el ultimo resultado del proceso de DSP, si hay uno nuevo, y lo
+        entrega a "metrics" como si lo hubiera medido add_array. Las claves
+        que agregan las funciones de "dsp_analyses" tambien se publican.
+        Si trae el espectro, se muestra en la vista del espectro.
+        """
+        result = self.dsp.poll()
+        if result is None and self.dsp.error is not None:
+            print(f"{self.dsp.error}, measuring locally")
+            self.dsp.stop()
+            self.dsp = None
+            return
+        # Si el proceso termino, add_array vuelve a medir en la interfaz
+
+        spectrum = result.pop("spectrum", None) if result is not None else None
+        if spectrum is not None and self.fft_mode:
+            self.analyzer.load(spectrum)
+            self._draw_spectrum()
+
+        if result is None or self.memory_record is not None:
+            return
+        # El registro del modo memoria tiene sus propias mediciones
+
+        self.measurements = {key: np.asarray(result[key]) for key in ("vp", "vpp", "mean", "vrms")}
+        self.peaks_lists = list(result["vp"])
+        self.freqs_lists = list(result["freq"])
+
+        for key in ("samples", "lost"):
+            result.pop(key, None)
+        self.metrics.update(result)
+
+    def _show_metrics(self, metrics):
+        """
+        Suscriptor de "metrics": muestra las mediciones en el panel.
+        """
+        self.buttonPanel.update_peaks(metrics)
+        if "freq" in metrics:
+            self.buttonPanel.update_freqs(metrics["freq"])
+
+    def _translate(self, frames):
         """
         Los valores recibidos son enteros de entre 0 y 4096, que corresponden
-        a mediciones de entre 0 y 3.3V, por lo cual, debo convertirlos.
+        a mediciones de entre 0 y 3.3V, por lo cual, debo convertirlos. La
+        tabla de conversion solo se reconstruye si cambian los limites.
         """
-        for index, value in enumerate(data):
-            data[index] = round((int(value) - in_min) * (out_max - out_min) / (in_max - in_min) + out_min, 2)
+        self.converter.configure(self.IN_MIN, self.IN_MAX, self.OUT_MIN, self.OUT_MAX)
+
+        return self.converter.convert(frames)
 
-        return data
+    def set_calibration(self, index, gain=1.0, offset=0.0):
+        """
+        Define la ganancia y el offset de calibracion de un canal.
+        """
+        self.converter.set_calibration(index, gain, offset)
 
     def _read_stream(self):
         """
         Lee desde la comunicacion serie.
         """
-        stream_data = self.stream.read(self.BYTES_SERIAL_READ) # Para leer todos los que esten en el buffer
+        profiler = self.profiler
+        start = time.perf_counter() if profiler is not None else 0
+
+        try:
+            count = self.decoder.read_from(self.stream, self.BYTES_SERIAL_READ)
+        except OSError as e:
+            print(f"Acquisition stopped: {e}")
+            self.timer.stop()
+            return
+        # Como en AcquisitionWorker, un stream cerrado (por ejemplo una
+        # conexion TCP que cerro el otro extremo) detiene la lectura
+
+        if not count:
+            return
+        # Lee todos los bytes que esten en el buffer
+
+        if profiler is not None:
+            start = profiler.record("read", start)
+
+        frames, resync = self.decoder.decode()
+
+        if profiler is not None:
+            profiler.record("decode", start)
+
+        if resync:
+            self._flush_input()
+        # Limpia el buffer cada vez que encuentra un error. Evita que
+        # el error se propague en la grafica o se desfasen las muestras
+
+        if len(frames):
+            self._process_frames(frames)
+
+    def _consume_ring(self):
+        """
+        Toma las tramas que el hilo de adquisicion dejo en el buffer.
+        """
+        frames = self.ring.pop()
+
+        if len(frames):
+            self._process_frames(frames)
+
+    def get_acquisition_stats(self):
+        """
+        Devuelve los contadores de desbordes, tramas descartadas y
+        resincronizaciones de la adquisicion.
+        """
+        if self.worker is not None:
+            return self.worker.get_stats()
+
+        return {
+            "overruns": 0,
+            "dropped": 0,
+            "resyncs": self.decoder.resync_count,
+            "lost_frames": self.decoder.lost_frames,
+            "fill_level": 0,
+        }
+
+    def _process_frames(self, frames, missing=None):
+        """
+        Procesa un lote de tramas completas, de (n_frames, n_plots).
+        "missing" marca las muestras que la adquisicion completo porque su
+        fuente estaba atrasada: se miden con el valor repetido, pero en la
+        grafica quedan como un hueco.
+        """
+        if self.recorder is not None:
+            self.recorder.write(frames)
+        # Solo se encola el lote, la escritura se hace en otro hilo
+
+        if self.shared_ring is not None:
+            self.shared_ring.publish(frames)
+        # Una copia del lote, sin locks, a la vista de otros procesos
 
-        stream_data_divided = [stream_data[i:i + 2] for i in range(0, len(stream_data), 2)]
+        profiler = self.profiler
+        start = time.perf_counter() if profiler is not None else 0
 
-        for stream_data in stream_data_divided:
-            stream_data = int.from_bytes(stream_data, self.BYTE_ORDER)
+        volts = self._translate(frames)
 
-            if stream_data > self.IN_MAX or stream_data < self.IN_MIN:
-                self.stream.flushInput()
-                break
-            # Limpia el buffer cada vez que encuentra un error. Evita que
-            # el error se propague en la grafica o se desfasen las muestras
-            
-            self.channel_data.append(stream_data)
+        if profiler is not None:
+            start = profiler.record("convert", start)
 
-            if len(self.channel_data) < self.n_plots:
-                continue
+        self.add_array(volts)
+        if self.fft_mode and self.dsp is None:
+            self.analyzer.extend(volts)
+        # El espectro solo acumula muestras, se calcula en _render o en el
+        # proceso de DSP
 
-            stream_data = self.channel_data
-            self.channel_data = list()
+        if profiler is not None:
+            start = profiler.record("measure", start)
 
-            stream_data = self._translate(stream_data, self.IN_MIN, self.IN_MAX, self.OUT_MIN, self.OUT_MAX)
+        if self.verbose:
+            print(volts)
 
-            self.add_array(stream_data)
+        if missing is not None:
+            volts[missing] = np.nan
 
-            if self.verbose:
-                print(stream_data)
+        self._update(volts)
 
-            self._update(stream_data)
+        if profiler is not None:
+            profiler.record("update", start)
+            profiler.count("samples_in", len(frames))
+        # Sin la opcion "profile" no se agrega trabajo por lote
+
+    def _flush_input(self):
+        """
+        Descarta el contenido acumulado en el stream junto con los bytes
+        pendientes del decodificador, para que la siguiente trama quede
+        alineada con el primer canal.
+        """
+        if hasattr(self.stream, 'flushInput'):
+            self.stream.flushInput()
+        self.decoder.reset()
 
     def _write_stream(self, text):
         """
@@ -282,6 +577,7 @@ class BasePlot(object):
         """
         index = self.TIME_RANGES.index(band)
         band = self.TIME_BAND[index]
+        self.visible_band = band
 
         for plot in self.plots.values():
             plot.setXRange(self.xlim - band, self.xlim)
@@ -307,6 +603,125 @@ class BasePlot(object):
     def change_trigger_freq(self, value):
         self.timer.setInterval(value)
 
+    def set_trigger_mode(self, text):
+        """
+        Cambia el modo de disparo. Los modos disponibles son:
+
+        "Libre": La grafica se desplaza con cada muestra, sin disparo.
+        "Auto": Se alinea con el disparo; si no hay disparos durante
+        AUTO_TRIGGER_MS, corre libre.
+        "Normal": Se alinea con el disparo y conserva el ultimo.
+        "Único": Captura un disparo y frena la adquisicion.
+        """
+        if text == "Libre":
+            self.trigger_mode = self.TRIGGER_OFF
+        elif text == "Auto":
+            self.trigger_mode = self.TRIGGER_AUTO
+        elif text == "Normal":
+            self.trigger_mode = self.TRIGGER_NORMAL
+        elif text == "Único":
+            self.trigger_mode = self.TRIGGER_SINGLE
+        else:
+            print("Fallo widget de seleccion de disparo")
+            return
+
+        self.arm_trigger()
+
+    def set_trigger(self, level=None, slope=None, hysteresis=None, holdoff=None, source=None):
+        """
+        Configura el disparo: nivel en V, flanco ("rising" o "falling"),
+        histeresis en V, holdoff en muestras y canal de origen.
+        """
+        self.trigger.configure(level, slope, hysteresis, holdoff)
+        if source is not None:
+            self.trigger_source = source
+        self.trigger.reset()
+
+        self._update_trigger_line()
+
+    def get_trigger_range(self):
+        """
+        Devuelve el maximo nivel de disparo, en valor absoluto.
+        """
+        return max(abs(self.OUT_MIN), abs(self.OUT_MAX))
+
+    def arm_trigger(self):
+        """
+        Descarta el disparo mostrado y espera uno nuevo. En el modo unico,
+        ademas reanuda la adquisicion.
+        """
+        self.trigger.reset()
+        self.trigger_candidates = list()
+        self.trigger_snapshot = None
+        self.last_trigger_total = self.trace.total
+        self.dirty = True
+
+        self._update_trigger_line()
+
+        if self.trigger_mode == self.TRIGGER_SINGLE and self.timer is not None and not self.timer.isActive():
+            self._resume_acquisition()
+
+    def _update_trigger_line(self):
+        """
+        Muestra el nivel de disparo sobre la grafica del canal de origen.
+        """
+        if self.trigger_line is None:
+            return
+
+        plot = list(self.plots.values())[self.trigger_source]
+        if self.trigger_line.getViewBox() is not plot.getViewBox():
+            if self.trigger_line.getViewBox() is not None:
+                self.trigger_line.getViewBox().removeItem(self.trigger_line)
+            plot.addItem(self.trigger_line, ignoreBounds=True)
+
+        self.trigger_line.setValue(self.trigger.level)
+        self.trigger_line.setVisible(self.trigger_mode != self.TRIGGER_OFF)
+
+    def _scan_trigger(self, volts):
+        """
+        Busca disparos en el lote recien agregado a la traza.
+        """
+        start = self.trace.total - len(volts)
+        events = self.trigger.scan(volts[:, self.trigger_source], start)
+
+        room = self.TRIGGER_QUEUE - len(self.trigger_candidates)
+        if len(events) and room > 0:
+            self.trigger_candidates.extend(events[:room].tolist())
+        # Se conservan los disparos mas viejos: son los primeros en tener
+        # todas sus muestras posteriores, los nuevos no los desplazan
+
+    def _capture_trigger(self):
+        """
+        Invocada antes de cada cuadro. Si algun disparo ya tiene todas sus
+        muestras posteriores, congela las trazas alineadas de forma que el
+        disparo quede en el centro de la ventana visible.
+        """
+        total = self.trace.total
+        post = self.visible_band // 2
+        right = self.xlim if self.xlim else self.trace.length
+
+        oldest = total - self.trace.length + self.visible_band - post
+        self.trigger_candidates = [event for event in self.trigger_candidates if event >= oldest]
+        # Los disparos que ya salieron de la traza no se pueden mostrar
+        complete = [event for event in self.trigger_candidates if event + post <= total]
+
+        if complete:
+            event = complete[-1]
+            self.trigger_candidates = [c for c in self.trigger_candidates if c > event]
+            self.trigger_snapshot = self.trace.channels().copy()
+            self.trigger_x = self.trace.x + (total - self.trace.length - event - post + right)
+            self.trigger_version += 1
+            self.last_trigger_total = total
+
+            if self.trigger_mode == self.TRIGGER_SINGLE:
+                self._pause_acquisition()
+            return
+
+        auto_samples = self.SAMPLE_RATE * self.AUTO_TRIGGER_MS / 1000
+        if self.trigger_mode == self.TRIGGER_AUTO and total - self.last_trigger_total > auto_samples:
+            self.trigger_snapshot = None
+        # Sin disparos, el modo auto vuelve a mostrar la señal en vivo
+
     def on_mode_change(self, text):
         """
         Permite cambiar el modo empleado. Los modos disponibles
@@ -318,19 +733,73 @@ class BasePlot(object):
         "A - B": Resta las dos primeras graficas.
         "A * B": Multiplica las dos primera graficas.
         "A / B": Divide las dos primeras graficas.
+        "Expresión": Evalua la expresion definida con set_math_expression.
+
+        Salvo en el modo simple, el resultado se muestra en una grafica
+        adicional, sin modificar las de los canales.
         """
         if text == "Simple":
-            self.mode = self.SIMPLE
+            mode = self.SIMPLE
         elif text == "A + B":
-            self.mode = self.A_PLUS_B
+            mode = self.A_PLUS_B
         elif text == "A - B":
-            self.mode = self.A_MINUS_B
+            mode = self.A_MINUS_B
         elif text == "A * B":
-            self.mode = self.A_X_B
+            mode = self.A_X_B
         elif text == "A / B":
-            self.mode = self.A_DIV_B
+            mode = self.A_DIV_B
+        elif text == "Expresión":
+            mode = self.EXPRESSION
         else:
             print("Fallo widget de seleccion de modo")
+            return
+
+        try:
+            if mode == self.EXPRESSION:
+                self.math.compile(self.math_expression)
+            elif mode != self.SIMPLE:
+                self.math.set_operation(self.MATH_OPERATIONS[mode])
+            # La expresion se compila una unica vez, al seleccionarla
+        except ValueError as e:
+            print(e)
+            return
+
+        self.mode = mode
+        self._show_math_plot(self.mode != self.SIMPLE)
+
+    def set_math_expression(self, expression):
+        """
+        Define la expresion del modo "Expresión", por ejemplo "(A - B) * 0.5".
+        Si el modo ya esta seleccionado, se compila en el momento; si no,
+        solo se valida. Devuelve False si la expresion no es valida.
+        """
+        math = self.math if self.mode == self.EXPRESSION else MathChannel(self.n_plots)
+
+        try:
+            math.compile(expression)
+        except ValueError as e:
+            print(e)
+            return False
+
+        self.math_expression = expression
+
+        return True
+
+    def _show_math_plot(self, visible):
+        """
+        Agrega o quita del layout la grafica del canal derivado.
+        """
+        if self.math_plot is None or visible == self.math_visible:
+            return
+
+        if visible:
+            self.layout.addItem(self.math_plot, row=self.n_plots + 1, col=0)
+        else:
+            self.layout.removeItem(self.math_plot)
+
+        self.math_visible = visible
+        self.decimators[self.n_plots].invalidate()
+        self.dirty = True
 
     def toggle_grid(self, index, value=None):
         """
@@ -354,19 +823,96 @@ class BasePlot(object):
 
     def apply_fft(self):
         """
-        Aplica FFT desde la funcion de la misma grafica.
+        Muestra u oculta la vista del espectro. Las graficas de tiempo no
+        cambian.
         """
         self.fft_mode = not self.fft_mode
 
-        for plot in self.plots.values():
-            curve = plot.listDataItems()[0]
-            curve.setFftMode(self.fft_mode)
+        if self.spectrum_view is None:
+            self._spectrum_init()
+
+        if self.fft_mode:
+            self.analyzer.reset()
+            self.spectrum_view.show()
+        else:
+            self.spectrum_view.hide()
+        # Oculta, la vista no acumula muestras ni calcula el espectro
+
+        if self.dsp is not None:
+            self.dsp.set_spectrum(self.fft_mode)
+
+    def _spectrum_init(self):
+        """
+        Crea la vista del espectro, en su propia ventana, con el espectro
+        promediado de cada canal y sus trazas de peak hold y max hold.
+        """
+        self.spectrum_view = pg.PlotWidget(title="Espectro")
+        self.spectrum_view.setWindowTitle("Software Oscilloscope - Espectro")
+        self.spectrum_view.resize(800, 500)
+        self.spectrum_view.setLabel("bottom", "Frecuencia", units="Hz")
+        self.spectrum_view.setLabel("left", "Magnitud", units="dBV")
+        self.spectrum_view.showGrid(True, True, alpha=0.3)
+        self.spectrum_view.setXRange(0, self.SAMPLE_RATE / 2)
+        self.spectrum_view.addLegend()
+        self.spectrum_view.closeEvent = self._spectrum_closed
+
+        for i in range(self.n_plots):
+            color = pg.intColor(i, hues=max(self.n_plots, 2))
+            name = chr(65 + i)
+            self.spectrum_curves.append((
+                self.spectrum_view.plot(pen=color, name=name),
+                self.spectrum_view.plot(pen=pg.mkPen(color, style=QtCore.Qt.DashLine), name=f"{name} peak"),
+                self.spectrum_view.plot(pen=pg.mkPen(color, style=QtCore.Qt.DotLine), name=f"{name} max"),
+            ))
+        self.set_spectrum_hold()
+
+    def _spectrum_closed(self, event=None):
+        """
+        Cerrar la ventana del espectro equivale a desactivarlo.
+        """
+        self.fft_mode = False
+        if self.dsp is not None:
+            self.dsp.set_spectrum(False)
+
+    def set_spectrum_hold(self, peak=None, maximum=None):
+        """
+        Muestra u oculta las trazas de peak hold y max hold.
+        """
+        if peak is not None:
+            self.spectrum_hold["peak"] = peak
+        if maximum is not None:
+            self.spectrum_hold["max"] = maximum
+
+        for curve, peak_curve, max_curve in self.spectrum_curves:
+            peak_curve.setVisible(self.spectrum_hold["peak"])
+            max_curve.setVisible(self.spectrum_hold["max"])
+
+    def reset_spectrum_hold(self):
+        self.analyzer.reset_hold()
+
+    def _update_spectrum(self):
+        """
+        Calcula el espectro con las muestras acumuladas y actualiza sus
+        trazas. Se invoca a lo sumo una vez por cuadro, segun la cadencia
+        de "analyzer".
+        """
+        self.analyzer.compute()
+        self._draw_spectrum()
 
-            if self.fft_mode:
-                plot.showAxes((True, False, False, True), showValues=(True, False, False, True))
-            else:
-                plot.showAxes((True, False, False, True), showValues=(True, False, False, False))
-            # Agrega o quita los numeros de los ejes
+    def _draw_spectrum(self):
+        """
+        Envia el espectro de "analyzer" y sus trazas de retencion a la
+        vista del espectro.
+        """
+        db = self.analyzer.db
+        freqs = self.analyzer.freqs
+
+        for i, (curve, peak_curve, max_curve) in enumerate(self.spectrum_curves):
+            curve.setData(x=freqs, y=db[i])
+            if self.spectrum_hold["peak"]:
+                peak_curve.setData(x=freqs, y=self.analyzer.peak_hold[i])
+            if self.spectrum_hold["max"]:
+                max_curve.setData(x=freqs, y=self.analyzer.max_hold[i])
 
     def _get_plot_info(self, plot):
         """
@@ -478,76 +1024,233 @@ class BasePlot(object):
                 hideButtons=True,
                 curveClickable=True,
             )
+            new_plot.sigXRangeChanged.connect(self._on_x_range_changed)
             self.layout.nextRow()
             self.scatter_plot_list.append(list())
+            self.decimators.append(EnvelopeDecimator())
+
+        self.math_plot = self.layout.addPlot(row=self.n_plots + 1, col=0)
+        self.math_plot.plot(np.zeros(self.SAMPLES), name="plot_math")
+        self.math_plot.setLabel("bottom", "Tiempo")
+        self.math_plot.setLabel("left", "Matemática")
+        self.math_plot.showAxes((True, False, False, True), showValues=(True, False, False, False))
+        self.math_plot.setMouseEnabled(False, True)
+        self.math_plot.hideButtons()
+        self.math_plot.setXLink(self.plots["plot_0"])
+        # Comparte la escala de tiempo con los canales
+        self.math_plot.sigXRangeChanged.connect(self._on_x_range_changed)
+        self.decimators.append(EnvelopeDecimator())
+        self.layout.removeItem(self.math_plot)
+        # Solo se muestra al elegir un modo distinto del simple
+
+        self.trigger_line = pg.InfiniteLine(angle=0, pen=pg.mkPen("y", style=QtCore.Qt.DashLine))
+        self._update_trigger_line()
+
+    def _update_widget(self, index, plot):
+        """
+        Actualiza directamente los puntos sobre la grafica. Solo se envia
+        la envolvente de minimos y maximos de la parte visible de la traza,
+        con una columna por pixel, y solo si cambiaron los datos o la escala.
+        """
+        curve = plot.listDataItems()[0]
+
+        if self.memory_record is not None:
+            x = self.memory_x
+            data = self.memory_record[index]
+            version = ("memory", self.memory_version)
+        elif self.trigger_snapshot is not None:
+            x = self.trigger_x
+            data = self.trigger_snapshot[index]
+            version = ("trigger", self.trigger_version)
+        else:
+            x = self.trace.x
+            data = self.trace.channel(index)
+            version = ("live", self.trace.version)
+        # Con disparo se muestran las trazas congeladas y alineadas
+
+        view_box = plot.getViewBox()
+        if view_box.autoRangeEnabled()[0]:
+            x_range = (x[0], x[-1] + 1)
+        else:
+            x_range = view_box.viewRange()[0]
+        width = max(int(view_box.width()), self.MIN_DECIMATION_COLUMNS)
 
-    def _update_widget(self, plot, data):
+        decimated = self.decimators[index].decimate(x, data, version, x_range, width)
+        if decimated is None:
+            return
+
+        curve.setData(x=decimated[0], y=decimated[1])
+
+    def _refresh_plots(self):
         """
-        Actualiza directamente los puntos sobre la grafica.
+        Envia la traza de cada canal a su grafica.
         """
-        plot = plot.listDataItems()[0]
+        for index, plot in enumerate(self.plots.values()):
+            self._update_widget(index, plot)
 
-        yData = plot.yData
-        yData[-1] = data
+        if self.math_visible:
+            self._update_widget(self.n_plots, self.math_plot)
 
-        plot.informViewBoundsChanged()
-        plot.setData(
-            x=np.arange(len(plot.yData)),
-            y=np.roll(yData, -1),
-        )
-        plot.updateItems()
-        plot.sigPlotChanged.emit(plot)
-
-    def _update(self, stream_data):
-        """
-        Funcion invocada en cada actualizacion de la grafica. Toma en cuenta
-        el modo en el que esta funcionando.
-        """
-        if self.memory_mode:
-            # Reviso si los valores recibidos estan dentro del margen de ruido
-            if float(stream_data[0]) < 0 and float(stream_data[0]) < -self.NOISE_BAND or \
-                float(stream_data[0]) > 0 and float(stream_data[0]) > self.NOISE_BAND:
-                self.timer_memory_mode = QtCore.QTimer()
-                self.timer_memory_mode.timeout.connect(self.disable_memory_mode)
-                self.timer_memory_mode.start(self.memory_mode_time)
-                self.memory_mode = False
-            else:
+    def _on_x_range_changed(self, *args):
+        """
+        Al cambiar la escala de tiempo o el zoom se vuelve a calcular la
+        envolvente, aunque no hayan llegado muestras nuevas.
+        """
+        self.dirty = True
+
+    def _render(self):
+        """
+        Invocada por el timer de refresco. Dibuja de una sola vez todas las
+        muestras recibidas desde el cuadro anterior. Si el redibujado tarda
+        mas que lo que permite RENDER_LOAD, se saltean cuadros para no
+        quitarle tiempo a la adquisicion.
+        """
+        if self.dsp is not None:
+            self._poll_dsp()
+
+        self.metrics.publish()
+        # Los indicadores tienen su propia cadencia, ver MetricsPublisher
+
+        now = time.perf_counter()
+
+        if self.fft_mode and self.dsp is None and self.analyzer.due():
+            self._update_spectrum()
+            if self.profiler is not None:
+                now = self.profiler.record("spectrum", now)
+        # El espectro tiene su propia cadencia, independiente de los cuadros
+
+        if self.profiler is not None and now >= self.next_hud:
+            self._update_hud()
+            self.next_hud = now + self.HUD_EVERY_MS / 1000
+        if now < self.next_render:
+            if self.dirty:
+                self.dropped_frames += 1
+            return
+
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        if self.trigger_mode != self.TRIGGER_OFF and self.memory_record is None:
+            self._capture_trigger()
+
+        self._refresh_plots()
+
+        if self.profiler is not None:
+            self.profiler.record("render", now)
+            self.profiler.count("samples_out", self.trace.total - self.rendered_total)
+            self.rendered_total = self.trace.total
+
+        elapsed = time.perf_counter() - now
+        self.next_render = now + elapsed / self.RENDER_LOAD
+
+    def _update_hud(self):
+        """
+        Actualiza los medidores de la instrumentacion y el resumen que se
+        muestra sobre las graficas.
+        """
+        gauges = self.get_acquisition_stats()
+        gauges["dropped_frames"] = self.dropped_frames
+        self.profiler.set_gauges(gauges)
+
+        if self.hud is None:
+            return
+
+        self.hud.setText(self.profiler.format())
+        self.hud.adjustSize()
+
+    def set_profile_overlay(self, visible):
+        """
+        Muestra u oculta el resumen de la instrumentacion sobre las
+        graficas. Requiere la opcion "profile".
+        """
+        if self.profiler is None:
+            return
+
+        if visible and self.hud is None:
+            self.hud = QtWidgets.QLabel(self.layout)
+            self.hud.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; font-family: monospace; padding: 4px")
+            self.hud.move(10, 10)
+            self.hud.show()
+            self._update_hud()
+        elif not visible and self.hud is not None:
+            self.hud.deleteLater()
+            self.hud = None
+
+    def dump_profile(self, path=None):
+        """
+        Guarda la instrumentacion en un archivo JSON y devuelve su ruta.
+        """
+        if self.profiler is None:
+            return None
+
+        if path is None:
+            path = time.strftime("profile_%Y%m%d_%H%M%S.json")
+
+        self._update_hud()
+        self.profiler.dump(path)
+        print(f"Profile saved to {path}")
+
+        return path
+
+    def set_fps(self, fps):
+        """
+        Cambia la frecuencia de refresco de las graficas.
+        """
+        self.fps = fps
+        if self.render_timer is not None:
+            self.render_timer.setInterval(int(1000 / self.fps))
+
+    def _update(self, volts):
+        """
+        Funcion invocada en cada actualizacion de la grafica, con un lote de
+        (n_samples, n_plots) tensiones. Toma en cuenta el modo en el que
+        esta funcionando.
+        """
+        if self.memory_capture is not None:
+            if self.memory_capture.feed(volts):
+                self.disable_memory_mode()
                 return
 
-        if self.mode == self.SIMPLE:
-            for data, plot in zip(stream_data, self.plots.values()):
-                self._update_widget(plot, data)
-
-        elif self.mode == self.A_PLUS_B:
-            if self.n_plots > 1:
-                self._update_widget(
-                    list(self.plots.values())[0],
-                    str(float(stream_data[0]) + float(stream_data[1]))
-                )
-
-        elif self.mode == self.A_MINUS_B:
-            if self.n_plots > 1:
-                self._update_widget(
-                    list(self.plots.values())[0],
-                    str(float(stream_data[0]) - float(stream_data[1]))
-                )
-
-        elif self.mode == self.A_X_B:
-            if self.n_plots > 1:
-                self._update_widget(
-                    list(self.plots.values())[0],
-                    str(float(stream_data[0]) * float(stream_data[1]))
-                )
-
-        elif self.mode == self.A_DIV_B:
-            if self.n_plots > 1:
-                self._update_widget(
-                    list(self.plots.values())[0],
-                    str(float(stream_data[0]) / float(stream_data[1]))
-                )
+            if not self.memory_capture.triggered:
+                return
+            # Mientras la señal esta dentro del margen de ruido no se dibuja
 
+        if self.mode != self.SIMPLE:
+            derived = self.math.compute(volts)
         else:
-            print("Fail on ComboBox")
+            derived = np.full(len(volts), np.nan, dtype=np.float32)
+        # El canal derivado se calcula sobre el lote completo
+
+        self.trace.extend(np.column_stack((volts, derived)))
+        self.dirty = True
+
+        if self.trigger_mode != self.TRIGGER_OFF:
+            self._scan_trigger(volts)
+        # El redibujado queda a cargo de _render
+
+    def _make_worker(self):
+        """
+        Crea el hilo de adquisicion, que lee el stream y deja las tramas en
+        "ring".
+        """
+        return AcquisitionWorker(self.stream, self.decoder, self.ring, self.BYTES_SERIAL_READ, self.profiler)
+
+    def _start_dsp(self):
+        """
+        Inicia el proceso de DSP, que sigue las tramas publicadas en
+        memoria compartida.
+        """
+        self.start_shared_memory()
+        self.dsp = DspWorker(
+            self.shared_ring.name,
+            self.dsp_window,
+            self.DSP_EVERY_MS,
+            analyses=self.dsp_analyses,
+            spectrum=self.spectrum_options
+        )
+        self.dsp.set_spectrum(self.fft_mode)
+        self.dsp.start()
 
     def start(self):
         """
@@ -555,12 +1258,27 @@ class BasePlot(object):
         """
         self._open_stream()
         self._plot_init()
+        if self.dsp_process:
+            self._start_dsp()
 
         self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self._read_stream)
+        if self.threaded:
+            self.worker = self._make_worker()
+            self.worker.start()
+            self.timer.timeout.connect(self._consume_ring)
+            # La interfaz solo consume lo que el hilo ya decodifico
+        else:
+            self.timer.timeout.connect(self._read_stream)
         self.timer.start(1)
 
+        self.render_timer = QtCore.QTimer()
+        self.render_timer.timeout.connect(self._render)
+        self.render_timer.start(int(1000 / self.fps))
+        # El refresco de pantalla es independiente de la lectura
+
         self.addControlsButton()
+        self.set_profile_overlay(True)
+        # Solo tiene efecto con la opcion "profile"
 
         if (sys.flags.interactive != 1) or not hasattr(QtCore, 'PYQT_VERSION'):
             self.app.exec_()
@@ -570,43 +1288,287 @@ class BasePlot(object):
         Funcion que frena o reiniciar la adquisicion de datos.
         """
         if self.timer.isActive():
-            self.timer.stop()
+            self._pause_acquisition()
         else:
-            self.stream.flushInput() # Descarto todo el contenido acumulado
-            self.timer.start()
+            self._resume_acquisition()
+
+    def _pause_acquisition(self):
+        self.timer.stop()
+        if self.worker is not None:
+            self.worker.pause()
+
+    def _resume_acquisition(self):
+        self._clear_memory_record()
+        if self.worker is not None:
+            self.ring.clear()
+            self.worker.resume(flush=True)
+        else:
+            self._flush_input() # Descarto todo el contenido acumulado
+        self.timer.start()
         
     def start_memory_mode(self, mode, time):
         """
         Funcion que inicia el modo de memoria que permite capturar
         transitorios en la entrada.
 
-        La logica aplicada, es que los valores de ruido se descartan, hasta que ingresa
-        un valor que aparenta ser una señal. Entonces se mide hasta que finaliza el tiempo
-        determinado por "time".
+        La logica aplicada, es que los valores de ruido se guardan en un
+        historial circular, hasta que ingresa un valor que aparenta ser una
+        señal. Entonces se toman las muestras correspondientes a "time" ms,
+        y el registro final incluye ademas el historial previo, de largo
+        MEMORY_PRE_TRIGGER veces la captura.
         """
         self.memory_mode = mode
         self.memory_mode_time = time
 
+        if not mode:
+            self.memory_capture = None
+            return
+
+        post_samples = max(1, int(time * self.SAMPLE_RATE / 1000))
+        pre_samples = int(post_samples * self.MEMORY_PRE_TRIGGER)
+        self.memory_capture = MemoryCapture(self.n_plots, pre_samples, post_samples, self.NOISE_BAND)
+
+        if self.timer is not None and not self.timer.isActive():
+            self._resume_acquisition()
+        self._clear_memory_record()
+
     def disable_memory_mode(self):
-        self.timer.stop()
-        self.timer_memory_mode.stop()
+        """
+        Invocada al completarse la captura: frena la adquisicion y muestra
+        el registro.
+        """
+        capture = self.memory_capture
+        self.memory_capture = None
+        self.memory_mode = False
+
+        self._pause_acquisition()
+        if capture is not None and capture.is_complete():
+            self._show_memory_record(capture.record)
         self.buttonPanel.disable_memory_mode()
 
+    def _show_memory_record(self, record):
+        """
+        Muestra el registro capturado y calcula sus mediciones. El registro
+        queda disponible para hacer zoom hasta que se reanuda la adquisicion.
+        """
+        if self.mode != self.SIMPLE:
+            derived = self.math.compute(record)
+        else:
+            derived = np.full(len(record), np.nan, dtype=np.float32)
+
+        self.memory_record = np.ascontiguousarray(np.column_stack((record, derived)).T)
+        self.memory_x = np.arange(len(record))
+        self.memory_version += 1
+
+        stats = WindowStats(self.n_plots, len(record))
+        stats.extend(record)
+        self.measurements = stats.get_measurements()
+        self.peaks_lists = list(self.measurements["vp"])
+        self.metrics.update(self.measurements)
+
+        if len(record) > 3:
+            frequency = FrequencyEstimator(self.n_plots, len(record), self.SAMPLE_RATE)
+            self.freqs_lists = list(frequency.estimate(record.T))
+            self.metrics.update({"freq": self.freqs_lists})
+        self.metrics.publish(force=True)
+
+        for plot in list(self.plots.values()) + [self.math_plot]:
+            plot.setMouseEnabled(True, True)
+        for plot in self.plots.values():
+            plot.setXRange(0, len(record))
+        # Habilita el zoom horizontal sobre todo el registro
+
+        self.dirty = True
+
+    def _clear_memory_record(self):
+        """
+        Descarta el registro del modo memoria y vuelve a la escala de
+        tiempo en vivo.
+        """
+        if self.memory_record is None:
+            return
+
+        self.memory_record = None
+
+        for plot in list(self.plots.values()) + [self.math_plot]:
+            plot.setMouseEnabled(False, True)
+        for plot in self.plots.values():
+            plot.setXRange(self.xlim - self.visible_band, self.xlim)
+
+        self.dirty = True
+
+    def start_recording(self, path=None):
+        """
+        Comienza a grabar en disco las tramas recibidas. Si no se indica
+        un archivo, se usa uno con la fecha y hora actual. Devuelve la ruta
+        del archivo.
+        """
+        if self.recorder is not None:
+            return self.recorder.path
+
+        if path is None:
+            path = time.strftime("captura_%Y%m%d_%H%M%S.osc")
+
+        self.recorder = CaptureWriter(
+            path,
+            self.n_plots,
+            self.SAMPLE_RATE,
+            self.BYTE_ORDER,
+            self.IN_MIN,
+            self.IN_MAX,
+            self.OUT_MIN,
+            self.OUT_MAX
+        )
+        print(f"Recording to {path}")
+
+        return path
+
+    def stop_recording(self):
+        """
+        Finaliza la grabacion en curso.
+        """
+        if self.recorder is None:
+            return
+
+        recorder = self.recorder
+        self.recorder = None
+        recorder.close()
+        print(f"Recording saved: {recorder.frames_written} frames, {recorder.dropped} dropped")
+
+    def is_recording(self):
+        return self.recorder is not None
+
+    def start_shared_memory(self, name=None):
+        """
+        Comienza a publicar las tramas recibidas en un buffer circular de
+        memoria compartida, que otros procesos pueden seguir con
+        SharedRingReader. Si no se indica un nombre, el sistema asigna
+        uno. Devuelve el nombre del segmento.
+        """
+        if self.shared_ring is None:
+            self.shared_ring = SharedRingPublisher(
+                self.n_plots,
+                self.SAMPLE_RATE,
+                self.IN_MIN,
+                self.IN_MAX,
+                self.OUT_MIN,
+                self.OUT_MAX,
+                name=name
+            )
+            print(f"Publishing to shared memory: {self.shared_ring.name}")
+
+        return self.shared_ring.name
+
+    def stop_shared_memory(self):
+        """
+        Deja de publicar y libera el segmento de memoria compartida.
+        """
+        if self.shared_ring is None:
+            return
+
+        shared_ring = self.shared_ring
+        self.shared_ring = None
+        shared_ring.close()
+
     def _close(self, event=None):
         """
         Invocado al cerrar la interfaz.
         """
         self.timer.stop()
+        self.render_timer.stop()
+        if self.worker is not None:
+            self.worker.stop()
+        # El hilo debe terminar antes de cerrar el stream
+        self.stop_recording()
+        if self.dsp is not None:
+            self.dsp.stop()
+        # El proceso de DSP deja de leer antes de liberar el segmento
+        self.stop_shared_memory()
+        if self.spectrum_view is not None:
+            self.spectrum_view.close()
+        if self.profile_path is not None:
+            self.dump_profile(self.profile_path)
         self._close_stream()
         self.app.exit()
 
 class SerialPlot(BasePlot):
     def __init__(self, app, com_port, baud_rate, n_plots, **kwargs):
-        self.serial_port = serial.Serial()
-        self.serial_port.baudrate = baud_rate
-        self.serial_port.port = com_port
-        self.serial_port.bytesize = serial.EIGHTBITS
-        self.serial_port.parity = serial.PARITY_EVEN
-        self.serial_port.stopbits = serial.STOPBITS_ONE
-        self.serial_port.timeout = 0.05
+        self.serial_port = make_serial_port(com_port, baud_rate)
         super(SerialPlot, self).__init__(app, self.serial_port, n_plots, **kwargs)
+
+class NetworkPlot(BasePlot):
+    """
+    Recibe las muestras por red, con TCP o UDP (ver SocketStream), en
+    lugar de un puerto serie.
+    """
+    def __init__(self, app, host, port, n_plots, transport="tcp", **kwargs):
+        self.socket_stream = SocketStream(host, port, transport)
+        super(NetworkPlot, self).__init__(app, self.socket_stream, n_plots, **kwargs)
+
+class MultiSerialPlot(BasePlot):
+    """
+    Muestra a la vez varias placas, cada una en su puerto serie. Cada
+    puerto se lee en su propio hilo (ver MultiSourceAcquisition) y los
+    canales de todas las placas se muestran juntos, en el orden de
+    "com_ports", con un unico refresco de pantalla. "n_plots" es la
+    cantidad de canales de cada placa, o una lista con la de cada una.
+    """
+    def __init__(self, app, com_ports, baud_rate, n_plots, **kwargs):
+        self.serial_ports = [make_serial_port(port, baud_rate) for port in com_ports]
+        if isinstance(n_plots, int):
+            n_plots = [n_plots] * len(com_ports)
+        self.channels_per_port = list(n_plots)
+        kwargs["threaded"] = True
+        # La lectura en hilos es la que independiza a los puertos
+        super(MultiSerialPlot, self).__init__(app, self.serial_ports[0], sum(self.channels_per_port), **kwargs)
+
+        self.MAX_LAG_MS = 100 # Atraso tolerado entre placas
+        self.source_times = [None] * len(com_ports) # Recepcion de la ultima muestra de cada placa
+
+    def get_streams(self):
+        return self.serial_ports
+
+    def _read_stream(self):
+        """
+        Antes de iniciar los hilos solo se descarta lo acumulado en cada
+        puerto.
+        """
+        for port in self.serial_ports:
+            port.flushInput()
+
+    def _make_worker(self):
+        sources = [
+            (port, self.PROTOCOLS[self.protocol](n, self.IN_MIN, self.IN_MAX, self.BYTE_ORDER))
+            for port, n in zip(self.serial_ports, self.channels_per_port)
+        ]
+
+        max_lag = int(self.SAMPLE_RATE * self.MAX_LAG_MS / 1000)
+
+        return MultiSourceAcquisition(sources, self.BYTES_SERIAL_READ, self.RING_FRAMES, max_lag, self.profiler)
+
+    def _consume_ring(self):
+        """
+        Toma las tramas alineadas de todos los puertos.
+        """
+        frames, missing, times = self.worker.pop()
+
+        if len(frames):
+            self.source_times = times[-1].tolist()
+            self._process_frames(frames, missing)
+
+class ReplayPlot(BasePlot):
+    def __init__(self, app, path, speed=1.0, loop=False, **kwargs):
+        self.replay_stream = ReplayStream(path, speed, loop)
+        header = self.replay_stream.header
+        super(ReplayPlot, self).__init__(app, self.replay_stream, header["n_channels"], **kwargs)
+
+        self.IN_MIN = header["in_min"]
+        self.IN_MAX = header["in_max"]
+        self.OUT_MIN = header["out_min"]
+        self.OUT_MAX = header["out_max"]
+        self.BYTE_ORDER = header["byte_order"]
+        self.protocol = "raw"
+        self.decoder = self._make_decoder()
+        self.set_sample_rate(header["sample_rate"])
+        # La captura define el formato y las escalas de las muestras, y
+        # guarda las tramas ya decodificadas, sin el protocolo con tramas
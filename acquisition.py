@@ -0,0 +1,366 @@
+import threading, time
+import numpy as np
+
+class SampleRing(object):
+    """
+    Buffer circular de tramas uint16, preasignado, para un unico productor
+    y un unico consumidor. El productor solo modifica el indice de
+    escritura y el consumidor solo el de lectura, por lo que no hace falta
+    ningun lock: cada indice se publica despues de copiar los datos.
+
+    Si el buffer se llena, las tramas nuevas que no entran se descartan y
+    se contabilizan en "dropped" y "overruns".
+
+    Con "timestamps" ademas se guarda, para cada trama, el instante de
+    recepcion (time.monotonic) del lote al que pertenece, que devuelve
+    "pop_timed".
+    """
+    def __init__(self, capacity, n_channels, dtype=np.uint16, timestamps=False):
+        self.capacity = capacity
+        self.n_channels = n_channels
+        self.dropped = 0 # Tramas descartadas por falta de lugar
+        self.overruns = 0 # Escrituras que no entraron completas
+        self._data = np.zeros((self.capacity, self.n_channels), dtype=dtype)
+        self._times = np.zeros(self.capacity) if timestamps else None
+        self._write_index = 0 # Total de tramas escritas (productor)
+        self._read_index = 0 # Total de tramas leidas (consumidor)
+
+    def __len__(self):
+        return self._write_index - self._read_index
+
+    def fill_level(self):
+        """
+        Devuelve la fraccion ocupada del buffer, entre 0 y 1.
+        """
+        return len(self) / self.capacity
+
+    def push(self, frames, timestamp=None):
+        """
+        Agrega un lote de tramas de (n_frames, n_channels), recibido en el
+        instante "timestamp". Devuelve la cantidad de tramas que
+        efectivamente se guardaron.
+        """
+        free = self.capacity - (self._write_index - self._read_index)
+        n = len(frames)
+
+        if n > free:
+            self.dropped += n - free
+            self.overruns += 1
+            n = free
+        if n == 0:
+            return 0
+
+        start = self._write_index % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = frames[:first]
+        self._data[:n - first] = frames[first:n]
+        if self._times is not None:
+            self._times[start:start + first] = timestamp
+            self._times[:n - first] = timestamp
+
+        self._write_index += n
+        # Se publica el indice una vez copiados los datos
+
+        return n
+
+    def pop(self, max_frames=None):
+        """
+        Devuelve una copia de las tramas disponibles, de la mas antigua a la
+        mas reciente, y las libera del buffer.
+        """
+        return self.pop_timed(max_frames)[0]
+
+    def pop_timed(self, max_frames=None):
+        """
+        Como "pop", pero devuelve una tupla (frames, times) con el instante
+        de recepcion de cada trama. "times" es None si el buffer no guarda
+        instantes.
+        """
+        n = self._write_index - self._read_index
+        if max_frames is not None:
+            n = min(n, max_frames)
+
+        start = self._read_index % self.capacity
+        first = min(n, self.capacity - start)
+        frames = np.concatenate((self._data[start:start + first], self._data[:n - first]))
+        times = None
+        if self._times is not None:
+            times = np.concatenate((self._times[start:start + first], self._times[:n - first]))
+
+        self._read_index += n
+
+        return frames, times
+
+    def clear(self):
+        """
+        Descarta las tramas pendientes. Solo debe invocarla el consumidor.
+        """
+        self._read_index = self._write_index
+
+class AcquisitionWorker(threading.Thread):
+    """
+    Hilo que es dueño del stream: lee todos los bytes disponibles, los
+    decodifica en tramas y las deja en un SampleRing. La interfaz grafica
+    solo consume desde el buffer, por lo que un redibujado lento no
+    detiene la lectura del puerto.
+
+    Con un "profiler" (ver instrumentation.Profiler) se registran los
+    tiempos de lectura y decodificacion de cada lote.
+    """
+    IDLE_TIME = 0.001 # Espera cuando no hay datos disponibles
+
+    def __init__(self, stream, decoder, ring, read_size, profiler=None):
+        super(AcquisitionWorker, self).__init__(daemon=True)
+        self.stream = stream
+        self.decoder = decoder
+        self.ring = ring
+        self.read_size = read_size
+        self.profiler = profiler
+        self.error = None
+        self._running = threading.Event()
+        self._running.set()
+        self._paused = False
+        self._flush_requested = False
+
+    def _flush(self):
+        if hasattr(self.stream, 'flushInput'):
+            self.stream.flushInput()
+        self.decoder.reset()
+
+    def run(self):
+        while self._running.is_set():
+            if self._paused:
+                time.sleep(self.IDLE_TIME)
+                continue
+
+            if self._flush_requested:
+                self._flush_requested = False
+                self._flush()
+
+            profiler = self.profiler
+            start = time.perf_counter() if profiler is not None else 0
+
+            try:
+                count = self.decoder.read_from(self.stream, self.read_size)
+                received = time.monotonic()
+            except Exception as e:
+                self.error = e
+                print(f"Acquisition stopped: {e}")
+                break
+
+            if not count:
+                time.sleep(self.IDLE_TIME)
+                continue
+
+            if profiler is not None:
+                start = profiler.record("read", start)
+
+            frames, resync = self.decoder.decode()
+
+            if profiler is not None:
+                profiler.record("decode", start)
+
+            if resync:
+                self._flush()
+            # Igual que en la lectura directa, un valor fuera de rango
+            # descarta el contenido acumulado para recuperar la alineacion
+
+            if len(frames):
+                self.ring.push(frames, received)
+
+    def pause(self):
+        self._paused = True
+
+    def resume(self, flush=True):
+        """
+        Reanuda la lectura. Con "flush" se descarta lo acumulado en el
+        stream mientras estuvo pausado.
+        """
+        self._flush_requested = flush
+        self._paused = False
+
+    def stop(self, timeout=1.0):
+        """
+        Detiene el hilo y espera a que termine la lectura en curso.
+        """
+        self._running.clear()
+        if self.is_alive():
+            self.join(timeout)
+
+    def get_stats(self):
+        return {
+            "overruns": self.ring.overruns,
+            "dropped": self.ring.dropped,
+            "resyncs": self.decoder.resync_count,
+            "lost_frames": self.decoder.lost_frames,
+            "fill_level": self.ring.fill_level(),
+        }
+
+class MultiSourceAcquisition(object):
+    """
+    Adquisicion desde varias fuentes (por ejemplo varias placas, cada una
+    en su puerto). Cada fuente tiene su propio AcquisitionWorker y su
+    propio SampleRing, por lo que un puerto lento no frena la lectura de
+    los demas. "pop" une las tramas de todas las fuentes en un unico
+    juego de canales, en el orden de "sources", alineadas por indice de
+    muestra: la fila i del resultado tiene la muestra i de cada fuente.
+
+    Si una fuente se atrasa mas de "max_lag" tramas respecto de la mas
+    adelantada, sus muestras faltantes se completan repitiendo su ultima
+    trama y se marcan en la mascara "missing", para que el resto de los
+    canales siga avanzando. Las tramas que luego llegan tarde para esos
+    indices se descartan, de forma que la alineacion se mantiene.
+
+    Cada fuente guarda el instante de recepcion de cada lote, y "pop"
+    devuelve, por fila y por fuente, cuando llego esa muestra.
+    """
+    def __init__(self, sources, read_size, capacity, max_lag, profiler=None):
+        self.streams = [stream for stream, _ in sources]
+        self.decoders = [decoder for _, decoder in sources]
+        self.max_lag = max_lag
+        self.channels = [decoder.n_channels for decoder in self.decoders]
+        self.n_channels = sum(self.channels)
+        self.columns = np.cumsum([0] + self.channels)
+        # Columnas de cada fuente dentro del juego de canales
+        self.rings = [SampleRing(capacity, n, timestamps=True) for n in self.channels]
+        self.workers = [
+            AcquisitionWorker(stream, decoder, ring, read_size, profiler)
+            for stream, decoder, ring in zip(self.streams, self.decoders, self.rings)
+        ]
+        self.total = 0 # Filas entregadas por "pop"
+        self.clear()
+
+    def clear(self):
+        """
+        Descarta lo pendiente y reinicia la alineacion. Solo debe
+        invocarla el consumidor.
+        """
+        for ring in self.rings:
+            ring.clear()
+        self._pending = [np.zeros((0, n), dtype=np.uint16) for n in self.channels]
+        self._pending_times = [np.zeros(0) for _ in self.channels]
+        self._last = [np.zeros(n, dtype=np.uint16) for n in self.channels]
+        self._late = [0] * len(self.rings) # Tramas a descartar por llegar tarde
+        self.received = [0] * len(self.rings)
+        self.padded = [0] * len(self.rings)
+        self.discarded = [0] * len(self.rings)
+        self.last_time = [None] * len(self.rings) # Ultima recepcion de cada fuente
+
+    @property
+    def error(self):
+        for worker in self.workers:
+            if worker.error is not None:
+                return worker.error
+
+        return None
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def pause(self):
+        for worker in self.workers:
+            worker.pause()
+
+    def resume(self, flush=True):
+        self.clear()
+        for worker in self.workers:
+            worker.resume(flush)
+
+    def stop(self, timeout=1.0):
+        for worker in self.workers:
+            worker.stop(timeout)
+
+    def _collect(self, index):
+        """
+        Pasa las tramas nuevas de una fuente a su lista de pendientes.
+        """
+        frames, times = self.rings[index].pop_timed()
+        if not len(frames):
+            return
+
+        self.received[index] += len(frames)
+        self.last_time[index] = times[-1]
+
+        late = min(self._late[index], len(frames))
+        if late:
+            self._late[index] -= late
+            self.discarded[index] += late
+            frames = frames[late:]
+            times = times[late:]
+        # Estos indices ya se entregaron completados con la ultima trama
+
+        self._pending[index] = np.concatenate((self._pending[index], frames))
+        self._pending_times[index] = np.concatenate((self._pending_times[index], times))
+
+    def pop(self):
+        """
+        Devuelve una tupla (frames, missing, times): las filas alineadas de
+        todas las fuentes, de (n_frames, n_channels); una mascara booleana
+        del mismo tamaño con las muestras completadas, o None si no hubo
+        ninguna; y de (n_frames, n_sources) el instante de recepcion
+        (time.monotonic) de cada fila en cada fuente, NaN si se completo.
+        """
+        for index in range(len(self.rings)):
+            self._collect(index)
+
+        available = [len(pending) for pending in self._pending]
+        n = max(min(available), max(available) - self.max_lag)
+        if n <= 0:
+            return np.zeros((0, self.n_channels), dtype=np.uint16), None, np.zeros((0, len(self.rings)))
+
+        frames = np.empty((n, self.n_channels), dtype=np.uint16)
+        missing = None
+        times = np.full((n, len(self.rings)), np.nan)
+
+        for index, pending in enumerate(self._pending):
+            start, end = self.columns[index], self.columns[index + 1]
+            taken = min(n, len(pending))
+
+            frames[:taken, start:end] = pending[:taken]
+            times[:taken, index] = self._pending_times[index][:taken]
+            if taken:
+                self._last[index] = pending[taken - 1]
+
+            if taken < n:
+                frames[taken:, start:end] = self._last[index]
+                if missing is None:
+                    missing = np.zeros(frames.shape, dtype=bool)
+                missing[taken:, start:end] = True
+                self.padded[index] += n - taken
+                self._late[index] += n - taken
+            # La fuente atrasada se completa para no frenar a las demas
+
+            self._pending[index] = pending[taken:]
+            self._pending_times[index] = self._pending_times[index][taken:]
+
+        self.total += n
+
+        return frames, missing, times
+
+    def get_stats(self):
+        """
+        Devuelve los contadores sumados de todas las fuentes y, en
+        "sources", los de cada una, con su atraso en tramas y el tiempo
+        desde su ultima recepcion.
+        """
+        now = time.monotonic()
+        sources = list()
+        for index, worker in enumerate(self.workers):
+            stats = worker.get_stats()
+            stats["received"] = self.received[index]
+            stats["lag"] = max(len(p) for p in self._pending) - len(self._pending[index])
+            stats["padded"] = self.padded[index]
+            stats["discarded"] = self.discarded[index]
+            last_time = self.last_time[index]
+            stats["idle_ms"] = None if last_time is None else round((now - last_time) * 1000)
+            sources.append(stats)
+
+        totals = {
+            key: sum(stats[key] for stats in sources)
+            for key in ("overruns", "dropped", "resyncs", "lost_frames")
+        }
+        totals["fill_level"] = max(stats["fill_level"] for stats in sources)
+        totals["sources"] = sources
+
+        return totals
@@ -0,0 +1,76 @@
+import numpy as np
+
+IN_MIN = 0
+IN_MAX = 4095
+OUT_MIN = -3.6
+OUT_MAX = 3.4
+# Escalas por defecto de la placa: codigos del ADC y tension que representan
+
+class AdcConverter(object):
+    """
+    Convierte las lecturas del ADC a tension mediante una tabla precalculada.
+    La tabla tiene una fila por canal y una columna por cada codigo posible
+    del ADC (0 a in_max), y ya incluye la calibracion de ganancia y offset
+    de cada canal, por lo que la conversion de un lote de tramas se resuelve
+    con una sola indexacion.
+    """
+    DECIMALS = 2
+
+    def __init__(self, n_channels, in_min, in_max, out_min, out_max):
+        self.n_channels = n_channels
+        self.gains = np.ones(self.n_channels)
+        self.offsets = np.zeros(self.n_channels)
+        self._range = None
+        self._table = None
+        self._flat_table = None
+        self._channel_offsets = None
+
+        self.configure(in_min, in_max, out_min, out_max)
+
+    def configure(self, in_min, in_max, out_min, out_max):
+        """
+        Define los rangos de entrada y salida. La tabla solo se reconstruye
+        si alguno de los valores cambio.
+        """
+        new_range = (in_min, in_max, out_min, out_max)
+        if new_range == self._range:
+            return
+
+        self._range = new_range
+        self._channel_offsets = np.arange(self.n_channels) * (in_max + 1)
+        self._build_table()
+
+    def set_calibration(self, channel, gain=1.0, offset=0.0):
+        """
+        Define la calibracion de un canal, aplicada como:
+        tension = ganancia * tension_nominal + offset
+        """
+        if self.gains[channel] == gain and self.offsets[channel] == offset:
+            return
+
+        self.gains[channel] = gain
+        self.offsets[channel] = offset
+        self._build_table()
+
+    def _build_table(self):
+        in_min, in_max, out_min, out_max = self._range
+
+        codes = np.arange(in_max + 1, dtype=np.float64)
+        nominal = (codes - in_min) * (out_max - out_min) / (in_max - in_min) + out_min
+        table = self.gains[:, None] * nominal[None, :] + self.offsets[:, None]
+
+        self._table = np.round(table, self.DECIMALS).astype(np.float32)
+        self._flat_table = self._table.ravel()
+
+    def get_table(self):
+        """
+        Devuelve la tabla de conversion, de (n_channels, in_max + 1).
+        """
+        return self._table
+
+    def convert(self, frames):
+        """
+        Convierte un lote de tramas de (n_frames, n_channels) de uint16 en
+        un arreglo de tensiones float32 de la misma forma.
+        """
+        return self._flat_table[frames + self._channel_offsets]
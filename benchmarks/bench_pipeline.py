@@ -0,0 +1,244 @@
+"""
+Micro-benchmarks de cada etapa de la cadena de adquisicion de BasePlot:
+lectura del stream, decodificacion, conversion a tension, medicion y
+dibujado.
+
+Las graficas se crean con la plataforma "offscreen" de Qt, y los datos se
+leen desde un archivo de bytes grabado, a traves de un stream en memoria o
+de un puerto serie virtual "loop://" de pyserial. El resultado se imprime
+y se guarda como JSON para comparar entre commits.
+
+Uso:
+    python benchmarks/bench_pipeline.py --output resultados.json
+    python benchmarks/bench_pipeline.py --fixture captura.bin --stream loop
+"""
+import argparse, io, json, os, platform, subprocess, sys, time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import serial
+from pyqtgraph.Qt import QtWidgets
+from SoftOscilloscope import BasePlot
+from frameDecoder import encode_frames
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+STAGES = ["read", "decode", "convert", "measure", "render"]
+
+def make_fixture(path, n_frames=200000, n_channels=2, sample_rate=10000, seed=0, protocol="raw"):
+    """
+    Genera un archivo de bytes con el mismo formato que envia la placa:
+    palabras uint16 little-endian intercaladas por canal, con una senoidal
+    distinta por canal y algo de ruido. Con el protocolo "framed" cada
+    trama lleva ademas sincronismo, secuencia y CRC.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_frames) / sample_rate
+    columns = [
+        2048 + 1500 * np.sin(2 * np.pi * (50 + 70 * i) * t) + rng.normal(0, 8, n_frames)
+        for i in range(n_channels)
+    ]
+    words = np.clip(np.stack(columns, axis=1), 0, 4095).astype("<u2")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(encode_frames(words) if protocol == "framed" else words.tobytes())
+
+class MemoryStream(object):
+    """
+    Stream en memoria con la misma interfaz que usa BasePlot de un puerto
+    serie. Informa como disponibles a lo sumo "chunk_bytes" por lectura.
+    """
+    def __init__(self, data, chunk_bytes=None):
+        self._buffer = io.BytesIO(data)
+        self._size = len(data)
+        self._chunk_bytes = chunk_bytes or self._size
+
+    @property
+    def in_waiting(self):
+        return min(self._size - self._buffer.tell(), self._chunk_bytes)
+
+    def readinto(self, b):
+        return self._buffer.readinto(b)
+
+    def read(self, size):
+        return self._buffer.read(size)
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def flushInput(self):
+        pass
+
+class NullPanel(object):
+    """
+    Reemplaza al panel de botones: descarta las actualizaciones de los
+    indicadores.
+    """
+    def update_peaks(self, measurements):
+        pass
+
+    def update_freqs(self, freqs_lists):
+        pass
+
+class LoopStream(object):
+    """
+    Puerto serie virtual "loop://": cada fragmento del archivo se escribe
+    en el puerto antes de leerlo, como si lo hubiera enviado la placa.
+    """
+    def __init__(self, data, chunk_bytes):
+        self.port = serial.serial_for_url("loop://", timeout=0)
+        self._data = memoryview(data)
+        self._position = 0
+        self._chunk_bytes = chunk_bytes
+
+    @property
+    def in_waiting(self):
+        if self.port.in_waiting == 0 and self._position < len(self._data):
+            chunk = self._data[self._position:self._position + self._chunk_bytes]
+            self.port.write(chunk)
+            self._position += len(chunk)
+
+        return self.port.in_waiting
+
+    def readinto(self, b):
+        return self.port.readinto(b)
+
+    def read(self, size):
+        return self.port.read(size)
+
+    def open(self):
+        pass
+
+    def close(self):
+        self.port.close()
+
+    def flushInput(self):
+        self.port.reset_input_buffer()
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies) * 1e6
+
+    return {
+        "calls": len(latencies),
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p90_us": float(np.percentile(latencies, 90)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        "max_us": float(latencies.max()),
+    }
+
+def run(data, n_channels, stream_kind, chunk_bytes, repeat, protocol="raw"):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    plot = BasePlot(app, MemoryStream(b""), n_channels, xlim=7001, ylim=80, protocol=protocol)
+    plot.set_button_panel(NullPanel())
+    plot._open_stream()
+    plot._plot_init()
+
+    latencies = {stage: list() for stage in STAGES}
+    totals = {stage: 0.0 for stage in STAGES}
+    frames_total = 0
+
+    for _ in range(repeat):
+        if stream_kind == "loop":
+            stream = LoopStream(data, chunk_bytes)
+        else:
+            stream = MemoryStream(data, chunk_bytes)
+        plot.stream = stream
+        plot.decoder.reset()
+
+        while True:
+            start = time.perf_counter()
+            count = plot.decoder.read_from(stream, chunk_bytes)
+            if not count:
+                break
+            read = time.perf_counter()
+
+            frames, resync = plot.decoder.decode()
+            decoded = time.perf_counter()
+
+            volts = plot._translate(frames)
+            converted = time.perf_counter()
+
+            plot.add_array(volts)
+            measured = time.perf_counter()
+
+            plot._update(volts)
+            plot._refresh_plots()
+            app.processEvents()
+            rendered = time.perf_counter()
+
+            bounds = (start, read, decoded, converted, measured, rendered)
+            for stage, begin, end in zip(STAGES, bounds[:-1], bounds[1:]):
+                latencies[stage].append(end - begin)
+                totals[stage] += end - begin
+            frames_total += len(frames)
+
+        stream.close()
+
+    results = dict()
+    for stage in STAGES:
+        results[stage] = percentiles(latencies[stage])
+        results[stage]["samples_per_sec"] = frames_total / totals[stage] if totals[stage] else None
+
+    return results, frames_total
+
+def git_commit():
+    try:
+        output = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return output.stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de la cadena de adquisicion")
+    parser.add_argument("--fixture", help="archivo de bytes grabado (por defecto se genera uno sintetico)")
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--stream", choices=["memory", "loop"], default="memory")
+    parser.add_argument("--chunk-bytes", type=int, default=4096, help="bytes disponibles por lectura")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--protocol", choices=["raw", "framed"], default="raw")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    fixture = args.fixture
+    if fixture is None:
+        suffix = "_framed" if args.protocol == "framed" else ""
+        fixture = os.path.join(FIXTURES_DIR, f"sine_{args.channels}ch{suffix}.bin")
+        if not os.path.exists(fixture):
+            make_fixture(fixture, n_channels=args.channels, protocol=args.protocol)
+
+    with open(fixture, "rb") as f:
+        data = f.read()
+
+    results, frames_total = run(data, args.channels, args.stream, args.chunk_bytes, args.repeat, args.protocol)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "fixture": os.path.relpath(fixture, ROOT),
+        "stream": args.stream,
+        "chunk_bytes": args.chunk_bytes,
+        "channels": args.channels,
+        "protocol": args.protocol,
+        "frames": frames_total,
+        "stages": results,
+    }
+
+    for stage in STAGES:
+        r = results[stage]
+        print(f"{stage:8s} {r['samples_per_sec'] or 0:14.0f} samples/s  p50 {r['p50_us']:9.1f}us  p99 {r['p99_us']:9.1f}us")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,15 @@ from PyQt5.QtWidgets import (QWidget, QPushButton, QDial,
                              QGridLayout, QLabel, QLineEdit, QSlider)
 from PyQt5.QtGui import QIntValidator
 from PyQt5.QtCore import pyqtSlot, Qt
-import numpy as np
-from math import sqrt
 
 class ButtonPanel(QWidget):
+    SPECTRUM_HOLDS = {
+        "Peak hold": (True, False),
+        "Max hold": (False, True),
+        "Peak y max hold": (True, True),
+        "Sin retención": (False, False),
+    }
+    # Trazas (peak, max) de cada opcion; la primera es la de la grafica
 
     def __init__(self, plotWidget):
         super().__init__()
@@ -14,10 +19,17 @@ class ButtonPanel(QWidget):
         self.offset_amplitude = 50
         self.offset_time = 50
         self.plotWidget = plotWidget
+        self.n_channels = self.plotWidget.n_plots
         self.callbacks = [
-            [self.invert_Y_0, self.toggle_grid_0, self.delete_all_0, self.change_amplitude_0],
-            [self.invert_Y_1, self.toggle_grid_1, self.delete_all_1, self.change_amplitude_1]
+            [
+                self.channel_slot(self.invert_Y, i),
+                self.channel_slot(self.toggle_grid, i),
+                self.channel_slot(self.delete_all, i),
+                self.channel_dial_slot(self.change_amplitude, i),
+            ]
+            for i in range(self.n_channels)
         ]
+        # Los callbacks de cada canal se generan con el indice del canal
         self.colors = [
             "255,0,0",
             "255,170,0",
@@ -31,14 +43,16 @@ class ButtonPanel(QWidget):
             "255,0,0",
         ]
         self.vbox_panels = list()
-        self.labels = [[], []]
+        self.labels = [list() for _ in range(self.n_channels)]
+        self.tension_indicators = list()
+        self.freq_indicators = list()
         self.dials_labels = []
         self.visible = True
         self.memory_mode = False
         self.plotWidget.set_button_panel(self)
         self.AMP_RANGES, self.AMP_BAND, self.AMP_TEXTS = self.plotWidget.get_amp_ranges()
         self.TIME_RANGES, self.TIME_BAND, self.TIME_TEXTS = self.plotWidget.get_time_ranges()
-        self.init_UI(2)
+        self.init_UI(self.n_channels)
         self.plotWidget.start()
 
     def return_value(self, value):
@@ -46,6 +60,24 @@ class ButtonPanel(QWidget):
             return value
         return returner
 
+    def channel_slot(self, function, index):
+        """
+        Devuelve el slot de un boton, que invoca "function" con el indice
+        del canal.
+        """
+        def slot():
+            return function(index)
+        return slot
+
+    def channel_dial_slot(self, function, index):
+        """
+        Devuelve el callback de un dial, que invoca "function" con el
+        indice del canal y el dial.
+        """
+        def slot(dial):
+            return function(index, dial)
+        return slot
+
     def addLabel(self, title, color=None):
         label = QLabel(self)
         label.setText(title)
@@ -91,10 +123,11 @@ class ButtonPanel(QWidget):
 
         return groupBox, vbox
 
-    def addLineEdit(self, callback):
+    def addLineEdit(self, callback, int_only=True):
         textbox = QLineEdit(self)
         textbox.setAlignment(Qt.AlignCenter)
-        textbox.setValidator(QIntValidator(0, 999, self))
+        if int_only:
+            textbox.setValidator(QIntValidator(0, 999, self))
         textbox.returnPressed.connect(callback)
         return textbox
 
@@ -116,9 +149,25 @@ class ButtonPanel(QWidget):
         components.append(self.addButton('Stop/Run', 'Este boton frena o corre la medicion', self.stop_and_run))
         components.append(self.addButton('AutoRange', 'Ajusta automaticamente los parametros para la señal de entrada', self.autorange))
         components.append(self.addButton('FFT', 'Aplicar FFT en tiempo real', self.apply_fft))
+        hold_combo = self.addComboBox(list(self.SPECTRUM_HOLDS), self.set_spectrum_hold)
+        hold_combo.setToolTip('Trazas de retencion de la vista de espectro')
+        components.append(hold_combo)
+        components.append(self.addButton('Borrar retención', 'Reinicia las trazas de retencion del espectro', self.reset_spectrum_hold))
+        # Retencion del espectro
+        self.record_btn = self.addButton('Grabar', 'Graba en disco las muestras recibidas', self.toggle_recording)
+        components.append(self.record_btn)
         # Button Panels
-        components.append(self.addComboBox(["Simple", "A + B", "A - B", "A * B", "A / B"], self.on_mode_change))
+        modes = ["Simple", "A + B", "A - B", "A * B", "A / B", "Expresión"]
+        if canals_len < 2:
+            modes = ["Simple", "Expresión"]
+        # Las operaciones entre A y B requieren dos canales
+        components.append(self.addComboBox(modes, self.on_mode_change))
         # ComboBoxes
+        self.expression_line_edit = self.addLineEdit(self.change_math_expression, int_only=False)
+        self.expression_line_edit.setText(self.plotWidget.math_expression)
+        self.expression_line_edit.setToolTip('Expresion del modo "Expresión", por ejemplo (A - B) * 0.5')
+        components.append(self.expression_line_edit)
+        # Expresion del canal derivado
         components.append(self.addDial(self.TIME_RANGES[0], self.TIME_RANGES[-1], self.change_time)) # De 10us a 10000us (o 10ms)
         # Dials
         self.dials_labels.append(self.addLabel(self.TIME_TEXTS[-1]))
@@ -140,6 +189,9 @@ class ButtonPanel(QWidget):
             grid.addWidget(self.canals[canal_index], 0, canal_index + 1)
         # Canales
 
+        grid.addWidget(self.add_trigger_panel(canals_len), 0, len(self.canals) + 1)
+        # Disparo
+
         label_tension = self.addLabel("Vpico\nVpp\nVrms")
         grid.addWidget(label_tension, 1, 0)
         label_frecuencia = self.addLabel("Frecuencia")
@@ -148,20 +200,15 @@ class ButtonPanel(QWidget):
         label_tension.setStyleSheet("border-top: 1px solid black;padding: .25em 0")
         label_frecuencia.setStyleSheet("border-top: 1px solid black;padding: .25em 0")
 
-        self.indicador_tension_canal_A = self.addLabel("0V")
-        self.indicador_tension_canal_B = self.addLabel("0V")
-        self.indicador_frecuencia_canal_A = self.addLabel("0Hz")
-        self.indicador_frecuencia_canal_B = self.addLabel("0Hz")
+        for i in range(canals_len):
+            self.tension_indicators.append(self.addLabel("0V"))
+            self.freq_indicators.append(self.addLabel("0Hz"))
 
-        grid.addWidget(self.indicador_tension_canal_A, 1, 1)
-        grid.addWidget(self.indicador_tension_canal_B, 1, 2)
-        grid.addWidget(self.indicador_frecuencia_canal_A, 2, 1)
-        grid.addWidget(self.indicador_frecuencia_canal_B, 2, 2)
+            grid.addWidget(self.tension_indicators[-1], 1, i + 1)
+            grid.addWidget(self.freq_indicators[-1], 2, i + 1)
 
-        self.indicador_tension_canal_A.setStyleSheet("border-top: 1px solid black;padding: .25em 0")
-        self.indicador_tension_canal_B.setStyleSheet("border-top: 1px solid black;padding: .25em 0")
-        self.indicador_frecuencia_canal_A.setStyleSheet("border-top: 1px solid black;padding: .25em 0")
-        self.indicador_frecuencia_canal_B.setStyleSheet("border-top: 1px solid black;padding: .25em 0")
+            self.tension_indicators[-1].setStyleSheet("border-top: 1px solid black;padding: .25em 0")
+            self.freq_indicators[-1].setStyleSheet("border-top: 1px solid black;padding: .25em 0")
         # Indicadores de frecuencia y tension
         
         grid.addWidget(self.addLabel('Modo memoria'), 3, 0)
@@ -203,6 +250,32 @@ class ButtonPanel(QWidget):
 
         return groupBox
 
+    def add_trigger_panel(self, canals_len):
+        """
+        Se agregan los controles del disparo: modo, flanco, canal de origen
+        y nivel.
+        """
+        components = list()
+
+        components.append(self.addComboBox(["Libre", "Auto", "Normal", "Único"], self.set_trigger_mode))
+        components.append(self.addComboBox(["Ascendente", "Descendente"], self.set_trigger_slope))
+        components.append(self.addComboBox([f"Canal {chr(65 + i)}" for i in range(canals_len)], self.set_trigger_source))
+        # ComboBoxes
+
+        self.trigger_range = self.plotWidget.get_trigger_range()
+        self.trigger_level_label = self.addLabel("0.0 V")
+        self.trigger_slider = self.addSlider(-100, 100, self.slider_change_value)
+        self.trigger_slider.setValue(0)
+        components.append(self.trigger_slider)
+        components.append(self.trigger_level_label)
+        # Nivel, en porcentaje del rango de salida
+
+        components.append(self.addButton('Rearmar', 'Espera un nuevo disparo', self.arm_trigger))
+
+        groupBox, _ = self.addGroupBox("Disparo", components)
+
+        return groupBox
+
     def addPoint(self, plot_index, x, y, color):
         """
         Agrega un punto a la lista de puntos, mostrando el punto
@@ -233,43 +306,41 @@ class ButtonPanel(QWidget):
     def autorange(self):
         self.plotWidget.autorange()
 
-    @pyqtSlot()
-    def invert_Y_0(self):
-        self.plotWidget.invert_Y(0)
+    def invert_Y(self, index):
+        self.plotWidget.invert_Y(index)
 
-    @pyqtSlot()
-    def invert_Y_1(self):
-        self.plotWidget.invert_Y(1)
+    def toggle_grid(self, index):
+        self.plotWidget.toggle_grid(index)
 
-    @pyqtSlot()
-    def toggle_grid_0(self):
-        self.plotWidget.toggle_grid(0)
+    def delete_all(self, index):
+        self.plotWidget.delete_all(index)
+        for label in self.labels[index]:
+            label.setParent(None)
 
-    @pyqtSlot()
-    def toggle_grid_1(self):
-        self.plotWidget.toggle_grid(1)
+        self.labels[index] = []
 
     @pyqtSlot()
-    def delete_all_0(self):
-        self.plotWidget.delete_all(0)
-        for label_index in range(len(self.labels[0])):
-            label = self.labels[0][label_index]
-            label.setParent(None)
+    def apply_fft(self):
+        self.plotWidget.apply_fft()
 
-        self.labels[0] = []
-            
-    @pyqtSlot()
-    def delete_all_1(self):
-        self.plotWidget.delete_all(1)
-        for label_index in range(len(self.labels[1])):
-            label = self.labels[1][label_index]
-            label.setParent(None)
+    def set_spectrum_hold(self, text):
+        peak, maximum = self.SPECTRUM_HOLDS[text]
+        self.plotWidget.set_spectrum_hold(peak, maximum)
 
-        self.labels[1] = []
+    @pyqtSlot()
+    def reset_spectrum_hold(self):
+        self.plotWidget.reset_spectrum_hold()
 
     @pyqtSlot()
-    def apply_fft(self):
-        self.plotWidget.apply_fft()
+    def toggle_recording(self):
+        if self.plotWidget.is_recording():
+            self.plotWidget.stop_recording()
+            self.record_btn.setStyleSheet("background-color: lightgrey")
+            self.record_btn.setToolTip('Graba en disco las muestras recibidas')
+        else:
+            path = self.plotWidget.start_recording()
+            self.record_btn.setStyleSheet("background-color: red; color: white")
+            self.record_btn.setToolTip(f'Grabando en {path}')
 
     @pyqtSlot()
     def start_memory_mode(self):
@@ -294,10 +365,23 @@ class ButtonPanel(QWidget):
         self.start_memory_mode()
         # Se dispara cuando se presiona ENTER en el LineEdit
 
+    @pyqtSlot()
+    def change_math_expression(self):
+        if self.plotWidget.set_math_expression(self.expression_line_edit.text()):
+            self.expression_line_edit.setStyleSheet("")
+        else:
+            self.expression_line_edit.setStyleSheet("background-color: lightcoral")
+        # Se dispara cuando se presiona ENTER en el LineEdit
+
     @pyqtSlot()
     def slider_change_value(self):
-        value = int(np.log(self.trigger_slider.value()))
-        self.plotWidget.change_trigger_freq(value)
+        level = self.trigger_slider.value() / 100 * self.trigger_range
+        self.trigger_level_label.setText(f"{round(level, 2)} V")
+        self.plotWidget.set_trigger(level=level)
+
+    @pyqtSlot()
+    def arm_trigger(self):
+        self.plotWidget.arm_trigger()
 
     # Dials Callbacks
 
@@ -324,7 +408,7 @@ class ButtonPanel(QWidget):
         self.dials_labels[0].setText(str(self.TIME_TEXTS[self.TIME_RANGES.index(value)]))
         self.plotWidget.change_time(value)
 
-    def change_amplitude_0(self, dial):
+    def change_amplitude(self, index, dial):
         value = dial.value()
         value = self.constrain_value(value, self.AMP_RANGES)
 
@@ -332,44 +416,37 @@ class ButtonPanel(QWidget):
         # Esta instruccion junto con constrain_value permiten que el
         # dial tenga un comportamiento discreto
 
-        self.dials_labels[1].setText(str(self.AMP_TEXTS[self.AMP_RANGES.index(value)]))
-        self.plotWidget.change_amplitude(0, value)
+        self.dials_labels[index + 1].setText(str(self.AMP_TEXTS[self.AMP_RANGES.index(value)]))
+        self.plotWidget.change_amplitude(index, value)
 
-    def change_amplitude_1(self, dial):
-        value = dial.value()
-        value = self.constrain_value(value, self.AMP_RANGES)
-
-        dial.setValue(value)
-        # Esta instruccion junto con constrain_value permiten que el
-        # dial tenga un comportamiento discreto
+    def _set_indicator(self, indicator, text):
+        if indicator.text() != text:
+            indicator.setText(text)
+        # Evita redistribuir el panel si el valor mostrado no cambio
 
-        self.dials_labels[2].setText(str(self.AMP_TEXTS[self.AMP_RANGES.index(value)]))
-        self.plotWidget.change_amplitude(1, value)
-        
-    def update_peaks(self, peaks_lists):
-        vp0 = round(peaks_lists[0], 2)
-        vpp0 = round(vp0 * 2, 2)
-        vrms0 = round(vp0 / sqrt(2), 2)
-
-        vp1 = round(peaks_lists[1], 2)
-        vpp1 = round(vp1 * 2, 2)
-        vrms1 = round(vp1 / sqrt(2), 2)
-
-        self.indicador_tension_canal_A.setText(str(vp0) + " Vp\n" + str(vpp0) + " Vpp\n" + str(vrms0) + " Vrms")
-        self.indicador_tension_canal_B.setText(str(vp1) + " Vp\n" + str(vpp1) + " Vpp\n" + str(vrms1) + " Vrms")
+    def update_peaks(self, measurements):
+        for indicator, vp, vpp, vrms in zip(self.tension_indicators, measurements["vp"], measurements["vpp"], measurements["vrms"]):
+            self._set_indicator(indicator, f"{round(vp, 2)} Vp\n{round(vpp, 2)} Vpp\n{round(vrms, 2)} Vrms")
 
     def update_freqs(self, freqs_lists):
-        freqs_lists[0] = abs(round(freqs_lists[0] * 10000, 2))
-        freqs_lists[1] = abs(round(freqs_lists[1] * 10000, 2))
-        # Se multiplica por 10000 por el calculo da en 1/10 MHz
-        self.indicador_frecuencia_canal_A.setText(str(freqs_lists[0]) + " Hz")
-        self.indicador_frecuencia_canal_B.setText(str(freqs_lists[1]) + " Hz")
+        for indicator, freq in zip(self.freq_indicators, freqs_lists):
+            self._set_indicator(indicator, f"{round(freq, 2)} Hz")
+        # Las frecuencias ya se reciben en Hz
 
     # ComboBoxes Callbacks
 
     def on_mode_change(self, text):
         self.plotWidget.on_mode_change(text)
 
+    def set_trigger_mode(self, text):
+        self.plotWidget.set_trigger_mode(text)
+
+    def set_trigger_slope(self, text):
+        self.plotWidget.set_trigger(slope="rising" if text == "Ascendente" else "falling")
+
+    def set_trigger_source(self, text):
+        self.plotWidget.set_trigger(source=ord(text[-1]) - 65)
+
     # Others Events
 
     def disable_memory_mode(self):
@@ -0,0 +1,292 @@
+import mmap, os, queue, struct, threading, time
+import numpy as np
+
+MAGIC = b"OSCCAP1\0"
+VERSION = 1
+HEADER_FORMAT = "<8sHHB3xdiiddQ"
+HEADER_SIZE = 64
+# magic, version, canales, orden de bytes, frecuencia de muestreo,
+# IN_MIN, IN_MAX, OUT_MIN, OUT_MAX y cantidad de tramas
+
+def write_header(f, header):
+    data = struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        VERSION,
+        header["n_channels"],
+        0 if header["byte_order"] == "little" else 1,
+        header["sample_rate"],
+        header["in_min"],
+        header["in_max"],
+        header["out_min"],
+        header["out_max"],
+        header["n_frames"],
+    )
+    f.seek(0)
+    f.write(data.ljust(HEADER_SIZE, b"\0"))
+
+def read_header(f):
+    """
+    Lee el encabezado de una captura y lo devuelve como diccionario.
+    """
+    f.seek(0)
+    data = f.read(HEADER_SIZE)
+    if len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a capture file")
+
+    fields = struct.unpack(HEADER_FORMAT, data[:struct.calcsize(HEADER_FORMAT)])
+
+    return {
+        "version": fields[1],
+        "n_channels": fields[2],
+        "byte_order": "little" if fields[3] == 0 else "big",
+        "sample_rate": fields[4],
+        "in_min": fields[5],
+        "in_max": fields[6],
+        "out_min": fields[7],
+        "out_max": fields[8],
+        "n_frames": fields[9],
+    }
+
+class CaptureWriter(object):
+    """
+    Graba en disco las tramas uint16 de la adquisicion. El archivo tiene un
+    encabezado de HEADER_SIZE bytes con la cantidad de canales, frecuencia
+    de muestreo, orden de bytes y escalas IN_* / OUT_*, seguido de las
+    palabras de cada trama con el mismo formato que envia la placa.
+
+    "write" solo encola el lote; la escritura la hace un hilo propio, que
+    junta las tramas en un bloque preasignado de "block_frames" y lo
+    escribe de una sola vez cada vez que se llena, o cuando pasan
+    FLUSH_INTERVAL segundos sin lotes nuevos. Despues de cada bloque se
+    actualiza la cantidad de tramas del encabezado, por lo que si el
+    proceso termina de forma inesperada el archivo sigue siendo valido.
+    Si el disco no da abasto y la cola se llena, los lotes se descartan y
+    se contabilizan en "dropped" en lugar de frenar la adquisicion.
+    """
+    BLOCK_FRAMES = 1 << 16
+    QUEUE_SIZE = 256
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, n_channels, sample_rate, byte_order, in_min, in_max, out_min, out_max, block_frames=None):
+        self.path = path
+        self.header = {
+            "n_channels": n_channels,
+            "byte_order": byte_order,
+            "sample_rate": sample_rate,
+            "in_min": in_min,
+            "in_max": in_max,
+            "out_min": out_min,
+            "out_max": out_max,
+            "n_frames": 0,
+        }
+        self.frames_written = 0
+        self.dropped = 0 # Tramas descartadas por cola llena
+        self.error = None
+        self._dtype = np.dtype("<u2" if byte_order == "little" else ">u2")
+        self._block = np.zeros((block_frames or self.BLOCK_FRAMES, n_channels), dtype=self._dtype)
+        self._block_fill = 0
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._file = open(self.path, "wb")
+        write_header(self._file, self.header)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frames):
+        """
+        Encola un lote de tramas de (n_frames, n_channels). El arreglo no
+        debe modificarse despues de encolarlo.
+        """
+        try:
+            self._queue.put_nowait(frames)
+        except queue.Full:
+            self.dropped += len(frames)
+
+    def _flush_block(self):
+        """
+        Escribe el bloque acumulado y actualiza la cantidad de tramas del
+        encabezado.
+        """
+        if not self._block_fill:
+            return
+
+        self._file.write(memoryview(self._block[:self._block_fill]))
+        self.frames_written += self._block_fill
+        self._block_fill = 0
+
+        self.header["n_frames"] = self.frames_written
+        write_header(self._file, self.header)
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+
+    def _run(self):
+        while True:
+            try:
+                frames = self._queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                try:
+                    self._flush_block()
+                except OSError as e:
+                    self.error = e
+                    print(f"Recording stopped: {e}")
+                    break
+                continue
+            # Sin lotes nuevos, el bloque parcial se guarda igual
+            if frames is None:
+                break
+
+            try:
+                while len(frames):
+                    n = min(len(frames), len(self._block) - self._block_fill)
+                    self._block[self._block_fill:self._block_fill + n] = frames[:n]
+                    self._block_fill += n
+                    frames = frames[n:]
+
+                    if self._block_fill == len(self._block):
+                        self._flush_block()
+            except OSError as e:
+                self.error = e
+                print(f"Recording stopped: {e}")
+                break
+
+    def close(self):
+        """
+        Escribe el ultimo bloque, actualiza la cantidad de tramas en el
+        encabezado y cierra el archivo.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        if self.error is None:
+            self._flush_block()
+        self._file.close()
+
+class ReplayStream(object):
+    """
+    Stream que reproduce una captura grabada con CaptureWriter, con la
+    misma interfaz que un puerto serie (open, close, read, readinto,
+    in_waiting y flushInput), para poder usarlo con BasePlot.
+
+    El archivo se mapea en memoria y "read" devuelve vistas sobre el mapa,
+    sin copiar los datos. Con "speed" igual a 1 las tramas se entregan al
+    ritmo de la frecuencia de muestreo grabada, con otro valor se acelera
+    o se frena, y con None o 0 se entregan tan rapido como se lean.
+    """
+    MAX_READ = 1 << 20 # Bytes por lectura cuando no hay ritmo
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed or None
+        self.loop = loop
+        self.is_open = False
+
+        with open(self.path, "rb") as f:
+            self.header = read_header(f)
+
+        self.sample_rate = self.header["sample_rate"]
+        self.frame_size = 2 * self.header["n_channels"]
+
+        if not self.header["n_frames"]:
+            size = os.path.getsize(self.path) - HEADER_SIZE
+            self.header["n_frames"] = max(size, 0) // self.frame_size
+        # Una grabacion interrumpida antes del primer bloque no tiene la
+        # cantidad de tramas en el encabezado, se deduce del tamaño
+        self._file = None
+        self._map = None
+        self._data = None
+        self._position = 0 # Byte actual dentro de los datos
+        self._start_position = 0
+        self._start_time = 0
+
+    def open(self):
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        end = HEADER_SIZE + self.header["n_frames"] * self.frame_size
+        self._data = memoryview(self._map)[HEADER_SIZE:end]
+        self.is_open = True
+        self.seek(0)
+
+    def close(self):
+        if not self.is_open:
+            return
+
+        self._data.release()
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        # Si quedan vistas entregadas por "read" en uso, el mapa se libera
+        # cuando se descartan
+        self._file.close()
+        self.is_open = False
+
+    def __len__(self):
+        return self.header["n_frames"]
+
+    def seek(self, frame):
+        """
+        Se posiciona en la trama "frame". El ritmo de reproduccion se
+        cuenta desde ese punto.
+        """
+        frame = min(max(frame, 0), len(self))
+        self._position = frame * self.frame_size
+        self._start_position = self._position
+        self._start_time = time.monotonic()
+
+    def tell(self):
+        """
+        Devuelve el numero de la proxima trama a leer.
+        """
+        return self._position // self.frame_size
+
+    def set_speed(self, speed):
+        self.speed = speed or None
+        self.seek(self.tell())
+
+    def _released(self):
+        """
+        Devuelve hasta que byte de los datos ya "llego" segun el ritmo de
+        reproduccion.
+        """
+        if self.speed is None:
+            return min(self._position + self.MAX_READ, len(self._data))
+
+        elapsed = time.monotonic() - self._start_time
+        frames = int(elapsed * self.speed * self.sample_rate)
+
+        return min(self._start_position + frames * self.frame_size, len(self._data))
+
+    @property
+    def in_waiting(self):
+        if self.loop and self._position >= len(self._data):
+            self.seek(0)
+        # Al llegar al final vuelve a empezar
+
+        return self._released() - self._position
+
+    def read(self, size=1):
+        """
+        Devuelve una vista (memoryview) con hasta "size" bytes disponibles.
+        """
+        size = min(size, self.in_waiting)
+        data = self._data[self._position:self._position + size]
+        self._position += size
+
+        return data
+
+    def readinto(self, b):
+        size = min(len(b), self.in_waiting)
+        b[:size] = self._data[self._position:self._position + size]
+        self._position += size
+
+        return size
+
+    def flushInput(self):
+        """
+        Descarta lo que ya llego y no se leyo, como un puerto serie.
+        """
+        self._position = self._released()
+
+    def flushOutput(self):
+        pass
@@ -0,0 +1,44 @@
+import serial
+import serial.tools.list_ports
+
+def get_device_ports():
+    """
+    Devuelve todos los puertos que tienen un dispositivo con el modelo
+    "CP210x" conectado, ordenados por nombre.
+    """
+    available_ports = sorted(
+        p.device
+        for p in serial.tools.list_ports.comports()
+        if 'CP210x' in p.description  # may need tweaking to match new arduinos
+    )
+    if not available_ports:
+        raise IOError("No available port found")
+
+    return available_ports
+
+def get_device_port():
+    """
+    Esta funcion se conecta automaticamente al puerto que tiene un dispositivo
+    con el modelo "CP210x" conectado. Este corresponde al modulo USB que estamos
+    utilizando para conectar el puerto serie de la STM.
+    """
+    available_ports = get_device_ports()
+    if len(available_ports) > 1:
+        raise IOError("Multiple available ports found")
+
+    return available_ports[0]
+
+def make_serial_port(com_port, baud_rate):
+    """
+    Crea el puerto serie configurado como lo espera la placa. El puerto
+    se devuelve cerrado, se abre al iniciar la adquisicion. Ademas de un
+    dispositivo acepta las URL de pyserial, por ejemplo "loop://".
+    """
+    serial_port = serial.serial_for_url(com_port, do_not_open=True)
+    serial_port.baudrate = baud_rate
+    serial_port.bytesize = serial.EIGHTBITS
+    serial_port.parity = serial.PARITY_EVEN
+    serial_port.stopbits = serial.STOPBITS_ONE
+    serial_port.timeout = 0.05
+
+    return serial_port
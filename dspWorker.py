@@ -0,0 +1,170 @@
+import multiprocessing, queue, time
+import numpy as np
+from sharedRing import SharedRingReader
+from measurements import WindowStats, FrequencyEstimator
+from spectrumAnalyzer import SpectrumAnalyzer
+
+def run_dsp(ring_name, window, every_ms, analyses, spectrum, spectrum_enabled, results, stop):
+    """
+    Cuerpo del proceso de DSP: sigue el buffer de memoria compartida
+    "ring_name", mantiene la ventana de medicion y cada "every_ms"
+    milisegundos, si llegaron muestras nuevas, deja en "results" un
+    diccionario con las mediciones de cada canal. Mientras
+    "spectrum_enabled" esta activo, tambien calcula el espectro
+    promediado con un SpectrumAnalyzer configurado con "spectrum".
+    """
+    reader = SharedRingReader(ring_name)
+    stats = WindowStats(reader.n_channels, window)
+    frequency = FrequencyEstimator(reader.n_channels, window, reader.sample_rate)
+    analyzer = SpectrumAnalyzer(reader.n_channels, sample_rate=reader.sample_rate, **spectrum)
+    analyzing = False
+    pending = 0 # Muestras recibidas desde el ultimo resultado
+    next_time = time.monotonic()
+
+    try:
+        while not stop.is_set():
+            if spectrum_enabled.is_set() != analyzing:
+                analyzing = not analyzing
+                analyzer.reset()
+            # El espectro solo se calcula mientras la vista esta visible
+
+            if reader.wait(timeout=DspWorker.IDLE_TIME):
+                frames = reader.pop()
+                volts = reader.to_volts(frames)
+                stats.extend(volts)
+                if analyzing:
+                    analyzer.extend(volts)
+                pending += len(frames)
+
+            if not pending or time.monotonic() < next_time:
+                continue
+            next_time = time.monotonic() + every_ms / 1000
+            pending = 0
+
+            points = stats.ordered()
+            result = {key: values.tolist() for key, values in stats.get_measurements().items()}
+            result["freq"] = frequency.estimate(points).tolist()
+            if analyzing:
+                result["spectrum"] = analyzer.compute().astype(np.float32)
+            for analysis in analyses:
+                result.update(analysis(points, reader.sample_rate))
+            result["samples"] = reader.read_index
+            result["lost"] = reader.lost
+
+            try:
+                results.put_nowait(result)
+            except queue.Full:
+                pass
+            # Si la interfaz no consume, se descarta: solo importa el ultimo
+    finally:
+        reader.close()
+
+class DspWorker(object):
+    """
+    Proceso aparte que hace el analisis de las muestras (mediciones y
+    frecuencia dominante, como "add_array", y el espectro promediado de la
+    vista de espectro) fuera del proceso de la interfaz, para que no
+    compita por el GIL con el redibujado. El espectro solo se calcula
+    despues de habilitarlo con "set_spectrum".
+
+    Las muestras le llegan por el buffer de memoria compartida "ring_name"
+    (ver sharedRing), sin copiarlas entre procesos, y los resultados
+    vuelven por una cola. "poll" no bloquea y devuelve el ultimo
+    resultado disponible.
+
+    "analyses" es una lista de funciones adicionales, definidas a nivel de
+    modulo para poder enviarlas al proceso, que reciben la ventana de
+    (n_channels, window) y la frecuencia de muestreo y devuelven un
+    diccionario que se agrega al resultado. "spectrum" son las opciones
+    del SpectrumAnalyzer (size, window, averaging, ...).
+    """
+    QUEUE_SIZE = 4
+    IDLE_TIME = 0.01 # Espera maxima por muestras nuevas
+
+    def __init__(self, ring_name, window, every_ms=100, analyses=(), spectrum=None):
+        self.ring_name = ring_name
+        self.window = window
+        self.every_ms = every_ms
+        self.analyses = list(analyses)
+        self.spectrum = dict(spectrum or {"size": window})
+        self.latest = None # Ultimo resultado recibido
+        self.process = None
+        self._context = multiprocessing.get_context("spawn")
+        # El proceso no hereda Qt ni los hilos de la interfaz
+        self._results = None
+        self._stop = None
+        self._spectrum_enabled = self._context.Event()
+
+    def start(self):
+        self._results = self._context.Queue(self.QUEUE_SIZE)
+        self._stop = self._context.Event()
+        self.process = self._context.Process(
+            target=run_dsp,
+            args=(
+                self.ring_name,
+                self.window,
+                self.every_ms,
+                self.analyses,
+                self.spectrum,
+                self._spectrum_enabled,
+                self._results,
+                self._stop
+            ),
+            name="dsp",
+            daemon=True
+        )
+        self.process.start()
+
+    @property
+    def error(self):
+        """
+        Describe por que termino el proceso, o None si sigue corriendo.
+        """
+        if self.process is None or self.process.is_alive() or self._stop.is_set():
+            return None
+
+        return f"DSP process exited with code {self.process.exitcode}"
+
+    def set_spectrum(self, enabled):
+        """
+        Habilita o deshabilita el calculo del espectro. Al habilitarlo se
+        reinician los promedios.
+        """
+        if enabled:
+            self._spectrum_enabled.set()
+        else:
+            self._spectrum_enabled.clear()
+
+    def poll(self):
+        """
+        Vacia la cola de resultados sin bloquear. Devuelve el mas reciente,
+        o None si no llego ninguno desde la ultima vez.
+        """
+        result = None
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+
+        if result is not None:
+            self.latest = result
+
+        return result
+
+    def stop(self, timeout=1.0):
+        """
+        Detiene el proceso y espera a que termine.
+        """
+        if self.process is None:
+            return
+
+        self._stop.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+
+        self._results.cancel_join_thread()
+        self._results.close()
+        self.process = None
@@ -0,0 +1,304 @@
+import numpy as np
+
+BYTE_ORDER = "little"
+BYTES_SERIAL_READ = 100 # Bytes minimos por lectura del stream
+
+class FrameDecoder(object):
+    """
+    Convierte los bytes leidos desde el stream en tramas completas. Cada
+    trama contiene una palabra de 16 bits por canal, por lo que el resultado
+    de cada lectura es un arreglo de (n_frames, n_channels) de tipo uint16.
+
+    Los bytes se acumulan en un buffer de ingreso reutilizable, de forma que
+    una muestra o una trama partida entre dos lecturas se completa en la
+    siguiente en lugar de perderse o desfasar los canales.
+    """
+    WORD_SIZE = 2
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, n_channels, in_min, in_max, byte_order="little"):
+        self.n_channels = n_channels
+        self.in_min = in_min
+        self.in_max = in_max
+        self.byte_order = byte_order
+        self.dtype = np.dtype("<u2" if byte_order == "little" else ">u2")
+        self.frame_size = self.WORD_SIZE * self.n_channels
+        self.resync_count = 0
+        self.lost_frames = 0 # Solo lo informa el protocolo con tramas
+        self._buffer = bytearray(self.BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._fill = 0 # Cantidad de bytes validos en el buffer
+
+    def reset(self):
+        """
+        Descarta los bytes pendientes de la lectura anterior. Debe invocarse
+        cada vez que se limpia el buffer de entrada del stream, para que
+        la proxima trama arranque alineada con el primer canal.
+        """
+        self._fill = 0
+
+    def pending(self):
+        """
+        Devuelve la cantidad de bytes que esperan completar una trama.
+        """
+        return self._fill
+
+    def _reserve(self, size):
+        """
+        Asegura que el buffer tenga lugar para "size" bytes nuevos.
+        """
+        needed = self._fill + size
+        if needed <= len(self._buffer):
+            return
+
+        capacity = len(self._buffer)
+        while capacity < needed:
+            capacity *= 2
+
+        buffer = bytearray(capacity)
+        buffer[:self._fill] = self._view[:self._fill]
+        self._view.release()
+        self._buffer = buffer
+        self._view = memoryview(self._buffer)
+
+    def read_from(self, stream, default_size):
+        """
+        Lee del stream todos los bytes disponibles ("in_waiting") dentro del
+        buffer de ingreso, sin crear un objeto nuevo por lectura. Si el
+        stream no informa los bytes disponibles, se leen "default_size".
+        Devuelve la cantidad de bytes leidos.
+        """
+        size = getattr(stream, "in_waiting", None)
+        if size is None:
+            size = default_size
+        if size <= 0:
+            return 0
+
+        self._reserve(size)
+        target = self._view[self._fill:self._fill + size]
+
+        if hasattr(stream, "readinto"):
+            count = stream.readinto(target) or 0
+        else:
+            data = stream.read(size)
+            count = len(data)
+            target[:count] = data
+
+        self._fill += count
+
+        return count
+
+    def decode(self, data=None):
+        """
+        Decodifica el contenido del buffer de ingreso, agregando antes "data"
+        si se recibe, y devuelve una tupla (frames, resync). "frames" son
+        las tramas completas y validas, y "resync" indica que se encontro
+        un valor fuera del rango [in_min, in_max], por lo que el resto de la
+        lectura fue descartado y el stream debe resincronizarse.
+        """
+        if data is not None:
+            self._reserve(len(data))
+            self._view[self._fill:self._fill + len(data)] = data
+            self._fill += len(data)
+
+        n_words = self._fill // self.WORD_SIZE
+        words = np.frombuffer(self._buffer, dtype=self.dtype, count=n_words)
+
+        invalid = (words < self.in_min) | (words > self.in_max)
+        resync = bool(invalid.any())
+
+        if resync:
+            n_frames = int(invalid.argmax()) // self.n_channels
+            self.resync_count += 1
+            # Se conservan solo las tramas completas anteriores al error
+        else:
+            n_frames = n_words // self.n_channels
+
+        frames = words[:n_frames * self.n_channels].reshape(n_frames, self.n_channels)
+        frames = frames.astype(np.uint16)
+        del words
+        # La copia libera el buffer para poder reutilizarlo
+
+        if resync:
+            self._fill = 0
+        else:
+            used = n_frames * self.frame_size
+            leftover = self._fill - used
+            self._view[:leftover] = self._view[used:self._fill]
+            self._fill = leftover
+            # Los bytes de una trama incompleta quedan para la proxima lectura
+
+        return frames, resync
+
+def _crc16_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[byte] = crc & 0xFFFF
+
+    return table
+
+CRC16_TABLE = _crc16_table()
+
+def crc16(data):
+    """
+    CRC-16/CCITT-FALSE (polinomio 0x1021, valor inicial 0xFFFF) de cada
+    fila de "data", un arreglo uint8 de (n_frames, n_bytes). Se recorre
+    una columna de bytes por vez, calculando todas las tramas juntas.
+    """
+    crc = np.full(len(data), 0xFFFF, dtype=np.uint16)
+    for column in data.T:
+        crc = (crc << 8) ^ CRC16_TABLE[(crc >> 8) ^ column]
+
+    return crc
+
+class FramedDecoder(FrameDecoder):
+    """
+    Decodificador del protocolo con tramas. Cada trama tiene, en palabras
+    de 16 bits con el orden de bytes configurado:
+
+        SYNC_WORD, numero de secuencia, un valor por canal, CRC-16
+
+    donde el CRC se calcula sobre los bytes del numero de secuencia y los
+    valores (ver crc16). La palabra de sincronismo se busca en todo el
+    buffer de ingreso de una vez con NumPy, y cada candidato se valida con
+    su CRC, tambien de forma vectorizada. Los bytes que no forman una trama
+    valida se descartan sin perder las tramas buenas que los rodean, por
+    lo que nunca hace falta vaciar el stream.
+
+    Igual que en FrameDecoder, una trama con algun valor fuera del rango
+    [in_min, in_max] se descarta aunque su CRC sea valido, y se cuenta en
+    "invalid_frames". Los saltos en el numero de secuencia se acumulan en
+    "lost_frames", y cada tramo de bytes descartados cuenta como una
+    resincronizacion.
+    """
+    SYNC_WORD = 0xA55A
+
+    def __init__(self, n_channels, in_min, in_max, byte_order="little"):
+        super(FramedDecoder, self).__init__(n_channels, in_min, in_max, byte_order)
+        self.frame_size = self.WORD_SIZE * (self.n_channels + 3)
+        self.sync = np.array([self.SYNC_WORD], dtype=self.dtype).view(np.uint8)
+        self.sequence = None # Proximo numero de secuencia esperado
+        self.discarded_bytes = 0
+        self.invalid_frames = 0 # Tramas con CRC valido y valores fuera de rango
+        self._offsets = np.arange(self.frame_size)
+
+    def reset(self):
+        super(FramedDecoder, self).reset()
+        self.sequence = None
+
+    def _count_lost(self, sequences):
+        """
+        Acumula las tramas perdidas segun los saltos en la secuencia.
+        """
+        if self.sequence is not None:
+            sequences = np.concatenate(([self.sequence - 1], sequences))
+        steps = np.diff(sequences.astype(np.int64)) % 65536
+        self.lost_frames += int((steps - 1).clip(0).sum())
+
+        self.sequence = (int(sequences[-1]) + 1) % 65536
+
+    def _non_overlapping(self, starts):
+        """
+        Devuelve la mascara de los comienzos que no se superponen con la
+        ultima trama aceptada. Un falso sincronismo validado dentro de una
+        trama aceptada se descarta, y la trama siguiente se compara con la
+        aceptada, no con el descartado.
+        """
+        keep = np.diff(starts, prepend=-self.frame_size) >= self.frame_size
+        if keep.all():
+            return keep
+        # Sin superposiciones, el caso normal, no hace falta recorrerlos
+
+        last = -self.frame_size
+        for i, start in enumerate(starts.tolist()):
+            keep[i] = start - last >= self.frame_size
+            if keep[i]:
+                last = start
+
+        return keep
+
+    def decode(self, data=None):
+        """
+        Decodifica las tramas completas del buffer de ingreso y devuelve
+        una tupla (frames, resync) como FrameDecoder. "resync" siempre es
+        False, porque los errores se recuperan sin vaciar el stream.
+        """
+        if data is not None:
+            self._reserve(len(data))
+            self._view[self._fill:self._fill + len(data)] = data
+            self._fill += len(data)
+
+        last_start = self._fill - self.frame_size
+        # Un candidato posterior todavia no tiene la trama completa
+        if last_start < 0:
+            return np.zeros((0, self.n_channels), dtype=np.uint16), False
+
+        raw = np.frombuffer(self._buffer, dtype=np.uint8, count=self._fill)
+        starts = np.flatnonzero((raw[:last_start + 1] == self.sync[0]) & (raw[1:last_start + 2] == self.sync[1]))
+
+        candidates = raw[starts[:, None] + self._offsets]
+        checksum = candidates[:, -2:].copy().view(self.dtype)[:, 0]
+        valid = crc16(candidates[:, 2:-2]) == checksum
+        starts = starts[valid]
+        candidates = candidates[valid]
+
+        values = candidates.view(self.dtype)[:, 2:2 + self.n_channels]
+        in_range = ((values >= self.in_min) & (values <= self.in_max)).all(axis=1)
+        self.invalid_frames += int(len(in_range) - np.count_nonzero(in_range))
+        starts = starts[in_range]
+        candidates = candidates[in_range]
+        # Los valores fuera de rango no tienen conversion a tension
+
+        keep = self._non_overlapping(starts)
+        starts = starts[keep]
+        candidates = candidates[keep]
+
+        if len(starts):
+            consumed = int(starts[-1]) + self.frame_size
+            gaps = np.diff(starts, prepend=0)
+            gaps[1:] -= self.frame_size
+            self.resync_count += int(np.count_nonzero(gaps))
+            self.discarded_bytes += int(gaps.sum())
+        else:
+            consumed = last_start + 1
+            self.resync_count += 1
+            self.discarded_bytes += consumed
+        # Sin tramas validas se descarta todo lo que no puede ser el
+        # comienzo de una trama incompleta
+
+        words = candidates.view(self.dtype)
+        frames = words[:, 2:2 + self.n_channels].astype(np.uint16)
+        if len(frames):
+            self._count_lost(words[:, 1])
+        del raw, words, candidates
+
+        leftover = self._fill - consumed
+        self._view[:leftover] = self._view[consumed:self._fill]
+        self._fill = leftover
+
+        return frames, False
+
+def encode_frames(frames, sequence=0, byte_order="little"):
+    """
+    Arma los bytes de un lote de (n_frames, n_channels) valores con el
+    formato de FramedDecoder, numerando las tramas desde "sequence". Sirve
+    como referencia para el firmware y para generar datos de prueba.
+    """
+    dtype = np.dtype("<u2" if byte_order == "little" else ">u2")
+    n_frames, n_channels = frames.shape
+
+    words = np.empty((n_frames, n_channels + 3), dtype=dtype)
+    words[:, 0] = FramedDecoder.SYNC_WORD
+    words[:, 1] = (sequence + np.arange(n_frames)) % 65536
+    words[:, 2:2 + n_channels] = frames
+    words[:, -1] = crc16(words[:, 1:-1].copy().view(np.uint8))
+
+    return words.tobytes()
+
+PROTOCOLS = {
+    "raw": FrameDecoder, # Palabras uint16 intercaladas, sin encabezado
+    "framed": FramedDecoder, # Sincronismo, secuencia y CRC por trama
+}
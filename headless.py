@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import csv
+import json
+import sys
+import time
+import frameDecoder, adcConverter, measurements
+from adcConverter import AdcConverter
+from measurements import WindowStats, FrequencyEstimator, MetricsPublisher
+from capture import ReplayStream
+
+class HeadlessMonitor(object):
+    """
+    Corre la misma cadena de decodificacion y medicion que BasePlot, sin
+    Qt ni pyqtgraph: lee el stream, convierte las tramas a tension y
+    actualiza las mediciones de cada canal. Un MetricsPublisher emite
+    cada "interval" segundos una linea con Vp, Vpp, valor medio, valor
+    eficaz y frecuencia de cada canal, en formato JSON (una linea por
+    medicion) o CSV.
+    """
+    FORMATS = ("json", "csv")
+    FIELDS = ("vp", "vpp", "mean", "vrms", "freq")
+    PROTOCOLS = frameDecoder.PROTOCOLS
+    IN_MIN = adcConverter.IN_MIN
+    IN_MAX = adcConverter.IN_MAX
+    OUT_MIN = adcConverter.OUT_MIN
+    OUT_MAX = adcConverter.OUT_MAX
+    SAMPLE_RATE = measurements.SAMPLE_RATE
+    BYTE_ORDER = frameDecoder.BYTE_ORDER
+    BYTES_SERIAL_READ = frameDecoder.BYTES_SERIAL_READ
+    MAX_POINTS_IN_LIST = measurements.WINDOW
+    FFT_EVERY_SAMPLES = measurements.FFT_EVERY_SAMPLES
+    FFT_EVERY_MS = measurements.FFT_EVERY_MS
+    # Los mismos valores por defecto que BasePlot
+    IDLE_TIME = 0.001 # Espera cuando no hay datos disponibles
+
+    def __init__(self, stream, n_channels, output=sys.stdout, fmt="json", interval=1.0, **kwargs):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown format: {fmt}")
+
+        self.stream = stream
+        self.n_channels = n_channels
+        self.output = output
+        self.fmt = fmt
+        self.interval = interval
+
+        self.sample_rate = kwargs.get("sample_rate", self.SAMPLE_RATE)
+        self.in_min = kwargs.get("in_min", self.IN_MIN)
+        self.in_max = kwargs.get("in_max", self.IN_MAX)
+        self.out_min = kwargs.get("out_min", self.OUT_MIN)
+        self.out_max = kwargs.get("out_max", self.OUT_MAX)
+        self.byte_order = kwargs.get("byte_order", self.BYTE_ORDER)
+        window = kwargs.get("window", self.MAX_POINTS_IN_LIST)
+        protocol = kwargs.get("protocol", "raw")
+
+        self.names = [chr(65 + i) for i in range(self.n_channels)]
+        self.decoder = self.PROTOCOLS[protocol](self.n_channels, self.in_min, self.in_max, self.byte_order)
+        self.converter = AdcConverter(self.n_channels, self.in_min, self.in_max, self.out_min, self.out_max)
+        self.stats = WindowStats(self.n_channels, window)
+        self.frequency = FrequencyEstimator(
+            self.n_channels,
+            window,
+            self.sample_rate,
+            every_samples=self.FFT_EVERY_SAMPLES,
+            every_ms=self.FFT_EVERY_MS
+        )
+        self.metrics = MetricsPublisher(self.interval * 1000, decimals=4, only_changes=False)
+        self.metrics.subscribe(self.emit)
+        # Se emite una linea por intervalo aunque las mediciones no cambien
+        self.samples = 0 # Tramas procesadas desde el inicio
+        self.lines = 0 # Lineas emitidas
+        self._writer = None
+
+    def columns(self):
+        """
+        Devuelve los nombres de las columnas de cada linea.
+        """
+        columns = ["time", "samples"]
+        for name in self.names:
+            columns.extend(f"{name}_{field}" for field in self.FIELDS)
+
+        return columns
+
+    def process(self, frames):
+        """
+        Procesa un lote de tramas de (n_frames, n_channels).
+        """
+        volts = self.converter.convert(frames)
+        self.stats.extend(volts)
+        self.frequency.update(self.stats, len(volts))
+        self.samples += len(frames)
+
+        self.metrics.update(self.stats.get_measurements())
+        self.metrics.update({"freq": self.frequency.frequencies})
+
+    def poll(self):
+        """
+        Lee y procesa todo lo disponible en el stream. Devuelve la cantidad
+        de bytes leidos.
+        """
+        count = self.decoder.read_from(self.stream, self.BYTES_SERIAL_READ)
+        if not count:
+            return 0
+
+        frames, resync = self.decoder.decode()
+
+        if resync:
+            if hasattr(self.stream, 'flushInput'):
+                self.stream.flushInput()
+            self.decoder.reset()
+        # Igual que en la interfaz, un valor fuera de rango descarta lo
+        # acumulado para recuperar la alineacion de los canales
+
+        if len(frames):
+            self.process(frames)
+
+        return count
+
+    def get_measurements(self, metrics=None):
+        """
+        Devuelve un diccionario con las mediciones, publicadas por
+        "metrics" o las actuales, con una clave por columna.
+        """
+        if metrics is None:
+            metrics = self.metrics.snapshot()
+
+        row = {"time": round(time.time(), 3), "samples": self.samples}
+        for i, name in enumerate(self.names):
+            for field in self.FIELDS:
+                row[f"{name}_{field}"] = metrics[field][i]
+
+        return row
+
+    def emit(self, metrics=None):
+        """
+        Escribe una linea con las mediciones. Es el suscriptor de
+        "metrics".
+        """
+        row = self.get_measurements(metrics)
+
+        if self.fmt == "json":
+            self.output.write(json.dumps(row) + "\n")
+        else:
+            if self._writer is None:
+                self._writer = csv.DictWriter(self.output, fieldnames=self.columns(), lineterminator="\n")
+                self._writer.writeheader()
+            self._writer.writerow(row)
+
+        self.output.flush()
+        self.lines += 1
+
+    def _finished(self):
+        """
+        Una captura sin repeticion termina al leer la ultima trama.
+        """
+        if isinstance(self.stream, ReplayStream) and not self.stream.loop:
+            return self.stream.tell() >= len(self.stream)
+
+        return False
+
+    def run(self, duration=None, count=None):
+        """
+        Adquiere y emite mediciones hasta cumplir "duration" segundos,
+        emitir "count" lineas, terminar la captura o recibir Ctrl+C.
+        """
+        self.stream.open()
+        start = time.monotonic()
+
+        try:
+            while True:
+                if not self.poll():
+                    if self._finished():
+                        self.metrics.publish(force=True)
+                        break
+                    time.sleep(self.IDLE_TIME)
+
+                self.metrics.publish()
+
+                if count is not None and self.lines >= count:
+                    break
+                if duration is not None and time.monotonic() - start >= duration:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stream.close()
+
+def positive_float(text):
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: {text}")
+
+    return value
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Software Oscilloscope, mediciones sin interfaz grafica")
+    parser.add_argument("port", nargs="?", help="puerto serie (por defecto se busca el CP210x)")
+    parser.add_argument("--replay", metavar="FILE", help="mide una captura grabada en lugar de leer el puerto")
+    parser.add_argument("--speed", type=float, default=1.0, help="velocidad de reproduccion, 0 para ir lo mas rapido posible")
+    parser.add_argument("--loop", action="store_true", help="repite la captura al llegar al final")
+    parser.add_argument("--tcp", metavar="HOST:PORT", help="recibe las muestras por TCP, conectandose a HOST:PORT")
+    parser.add_argument("--udp", metavar="HOST:PORT", help="recibe las muestras por UDP, escuchando en HOST:PORT")
+    parser.add_argument("--channels", type=int, default=2, help="cantidad de canales")
+    parser.add_argument("--sample-rate", type=float, default=HeadlessMonitor.SAMPLE_RATE, help="muestras por segundo de cada canal")
+    parser.add_argument("--baud-rate", type=int, default=230400)
+    parser.add_argument("--protocol", choices=sorted(HeadlessMonitor.PROTOCOLS), default="raw", help="formato de las tramas de la placa")
+    parser.add_argument("--format", choices=HeadlessMonitor.FORMATS, default="json")
+    parser.add_argument("--rate", type=positive_float, default=1.0, help="lineas por segundo")
+    parser.add_argument("--duration", type=float, help="segundos de adquisicion")
+    parser.add_argument("--count", type=int, help="cantidad de lineas a emitir")
+    parser.add_argument("--output", metavar="FILE", help="archivo de salida (por defecto la salida estandar)")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.replay:
+        stream = ReplayStream(args.replay, args.speed, args.loop)
+        header = stream.header
+        options = dict(
+            sample_rate=header["sample_rate"],
+            in_min=header["in_min"],
+            in_max=header["in_max"],
+            out_min=header["out_min"],
+            out_max=header["out_max"],
+            byte_order=header["byte_order"],
+        )
+        n_channels = header["n_channels"]
+        # La captura define el formato y las escalas de las muestras
+    elif args.tcp or args.udp:
+        from networkStream import SocketStream
+        host, port = (args.tcp or args.udp).rsplit(":", 1)
+        stream = SocketStream(host, int(port), "tcp" if args.tcp else "udp")
+        options = dict(sample_rate=args.sample_rate, protocol=args.protocol)
+        n_channels = args.channels
+    else:
+        from devices import get_device_port, make_serial_port
+        stream = make_serial_port(args.port or get_device_port(), args.baud_rate)
+        options = dict(sample_rate=args.sample_rate, protocol=args.protocol)
+        n_channels = args.channels
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+
+    try:
+        monitor = HeadlessMonitor(stream, n_channels, output, args.format, 1 / args.rate, **options)
+        monitor.run(args.duration, args.count)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
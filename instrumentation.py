@@ -0,0 +1,132 @@
+import json, threading, time
+import numpy as np
+
+class Profiler(object):
+    """
+    Instrumentacion de la cadena de adquisicion. Por cada etapa ("read",
+    "decode", "convert", "measure", "update", "render") acumula la
+    cantidad de ejecuciones, el tiempo total y maximo, y un histograma de
+    duraciones con intervalos en potencias de dos de microsegundos. Ademas
+    lleva contadores (por ejemplo muestras de entrada y de salida) y
+    medidores con el ultimo valor informado (desbordes, resincronizaciones,
+    llenado del buffer).
+
+    Quien instrumenta solo invoca al perfilador si esta habilitado, por lo
+    que deshabilitado no agrega trabajo por lote.
+    """
+    BUCKETS = 24 # Histograma de 1us a 2**23us (unos 8s)
+
+    def __init__(self):
+        self.stages = dict()
+        self.counters = dict()
+        self.gauges = dict()
+        self.start_time = time.monotonic()
+        self._lock = threading.Lock()
+        # Las etapas de lectura se registran desde el hilo de adquisicion
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.start_time = time.monotonic()
+
+    def record(self, stage, start):
+        """
+        Registra una ejecucion de "stage" que empezo en "start", medido con
+        time.perf_counter. Devuelve el instante final, para encadenar
+        etapas consecutivas.
+        """
+        end = time.perf_counter()
+        elapsed = end - start
+        bucket = min(max(int(elapsed * 1e6), 1).bit_length() - 1, self.BUCKETS - 1)
+
+        with self._lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "histogram": np.zeros(self.BUCKETS, dtype=np.int64),
+                }
+            entry["count"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            entry["histogram"][bucket] += 1
+
+        return end
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_gauges(self, values):
+        """
+        Actualiza los medidores con el ultimo valor de cada clave.
+        """
+        with self._lock:
+            self.gauges.update(values)
+
+    def _percentile(self, histogram, fraction):
+        """
+        Devuelve, en microsegundos, el limite superior del intervalo del
+        histograma que contiene el percentil "fraction".
+        """
+        cumulative = np.cumsum(histogram)
+        if cumulative[-1] == 0:
+            return 0
+
+        index = int(np.searchsorted(cumulative, fraction * cumulative[-1]))
+
+        return 2 ** (index + 1)
+
+    def summary(self):
+        """
+        Devuelve un diccionario con el estado de la instrumentacion, listo
+        para convertir a JSON.
+        """
+        with self._lock:
+            elapsed = max(time.monotonic() - self.start_time, 1e-9)
+            stages = dict()
+            for stage, entry in self.stages.items():
+                stages[stage] = {
+                    "count": entry["count"],
+                    "mean_us": round(entry["total"] / entry["count"] * 1e6, 1),
+                    "max_us": round(entry["max"] * 1e6, 1),
+                    "p50_us": self._percentile(entry["histogram"], 0.5),
+                    "p99_us": self._percentile(entry["histogram"], 0.99),
+                    "load": round(entry["total"] / elapsed, 4),
+                    "histogram": entry["histogram"].tolist(),
+                }
+
+            return {
+                "elapsed": round(elapsed, 3),
+                "stages": stages,
+                "counters": dict(self.counters),
+                "rates": {name: round(value / elapsed, 1) for name, value in self.counters.items()},
+                "gauges": dict(self.gauges),
+            }
+
+    def format(self):
+        """
+        Devuelve un resumen en texto, una linea por etapa, para mostrar en
+        pantalla.
+        """
+        summary = self.summary()
+
+        lines = [
+            f"{stage:<8} {entry['mean_us']:>9.1f}us  p99 {entry['p99_us']:>7}us  {100 * entry['load']:5.1f}%"
+            for stage, entry in summary["stages"].items()
+        ]
+        lines.extend(f"{name}: {rate:.0f}/s" for name, rate in summary["rates"].items())
+        lines.extend(f"{name}: {value}" for name, value in summary["gauges"].items())
+
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Guarda el resumen en "path", en formato JSON.
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
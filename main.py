@@ -1,35 +1,49 @@
 # -*- coding: utf-8 -*-
 
-from SoftOscilloscope import SerialPlot
+from SoftOscilloscope import SerialPlot, MultiSerialPlot, NetworkPlot, ReplayPlot
 from buttonPanel import ButtonPanel
 from PyQt5.QtWidgets import QApplication
+import argparse
 import sys
-import serial.tools.list_ports
-
-def get_device_port():
-    """
-    Esta funcion se conecta automaticamente al puerto que tiene un dispositivo
-    con el modelo "CP210x" conectado. Este corresponde al modulo USB que estamos
-    utilizando para conectar el puerto serie de la STM.
-    """
-    available_ports = [
-        p.device
-        for p in serial.tools.list_ports.comports()
-        if 'CP210x' in p.description  # may need tweaking to match new arduinos
-    ]
-    if not available_ports:
-        raise IOError("No available port found")
-    if len(available_ports) > 1:
-        raise IOError("Multiple available ports found")
-    
-    return available_ports[0]
+from devices import get_device_ports
+import frameDecoder, measurements
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Software Oscilloscope")
+    parser.add_argument("port", nargs="*", help="puertos serie, uno por placa (por defecto se buscan los CP210x)")
+    parser.add_argument("--replay", metavar="FILE", help="reproduce una captura grabada en lugar de leer el puerto")
+    parser.add_argument("--speed", type=float, default=1.0, help="velocidad de reproduccion, 0 para ir lo mas rapido posible")
+    parser.add_argument("--loop", action="store_true", help="repite la captura al llegar al final")
+    parser.add_argument("--tcp", metavar="HOST:PORT", help="recibe las muestras por TCP, conectandose a HOST:PORT")
+    parser.add_argument("--udp", metavar="HOST:PORT", help="recibe las muestras por UDP, escuchando en HOST:PORT")
+    parser.add_argument("--profile", nargs="?", const=True, default=False, metavar="FILE", help="muestra la instrumentacion y la guarda en FILE al cerrar")
+    parser.add_argument("--shared-memory", nargs="?", const=True, default=False, metavar="NAME", help="publica las tramas en memoria compartida para otros procesos")
+    parser.add_argument("--dsp-process", action="store_true", help="hace las mediciones en un proceso aparte")
+    parser.add_argument("--protocol", choices=sorted(frameDecoder.PROTOCOLS), default="raw", help="formato de las tramas de la placa")
+    parser.add_argument("--channels", type=int, default=2, help="cantidad de canales que envia cada placa")
+
+    return parser.parse_args()
 
 def main():
-    port = sys.argv[1] if len(sys.argv) > 1 else get_device_port()
+    args = parse_args()
 
     app = QApplication(sys.argv)
 
-    plot = SerialPlot(app, port, 230400, n_plots=2, verbose=False, xlim=7001, ylim=80, showGrid=True)
+    options = dict(verbose=False, xlim=7001, ylim=80, showGrid=True, fps=30, threaded=True, profile=args.profile, shared_memory=args.shared_memory, dsp_process=args.dsp_process)
+
+    if args.replay:
+        plot = ReplayPlot(app, args.replay, speed=args.speed, loop=args.loop, **options)
+    elif args.tcp or args.udp:
+        transport = "tcp" if args.tcp else "udp"
+        host, port = (args.tcp or args.udp).rsplit(":", 1)
+        plot = NetworkPlot(app, host, int(port), args.channels, transport, sample_rate=measurements.SAMPLE_RATE, protocol=args.protocol, **options)
+    else:
+        ports = args.port or get_device_ports()
+        if len(ports) > 1:
+            plot = MultiSerialPlot(app, ports, 230400, n_plots=args.channels, sample_rate=measurements.SAMPLE_RATE, protocol=args.protocol, **options)
+        else:
+            plot = SerialPlot(app, ports[0], 230400, n_plots=args.channels, sample_rate=measurements.SAMPLE_RATE, protocol=args.protocol, **options)
+        # Con varias placas cada una se lee en su propio hilo
     buttonPanel = ButtonPanel(plot)
     plot.set_button_panel(buttonPanel)
 
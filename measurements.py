@@ -0,0 +1,288 @@
+from math import gcd
+import time
+import numpy as np
+
+SAMPLE_RATE = 10000 # Muestras por segundo de cada canal
+WINDOW = 1024 # Muestras de la ventana de medicion
+FFT_EVERY_SAMPLES = 256 # Cadencia de la estimacion de frecuencia
+FFT_EVERY_MS = 100
+
+class WindowStats(object):
+    """
+    Mantiene las ultimas "window" muestras de cada canal en un arreglo
+    circular de (n_channels, window), junto con estadisticas que se
+    actualizan de forma incremental con cada lote:
+
+    - Suma y suma de cuadrados, para el valor medio y el valor eficaz.
+    - Maximo y minimo de cada bloque de BLOCK muestras, de forma que el
+      extremo de la ventana se obtiene de los bloques y solo se recalculan
+      los bloques que el lote modifico.
+
+    Asi, el costo por muestra es constante (amortizado) en lugar de
+    recorrer la ventana completa en cada muestra.
+    """
+    BLOCK = 32
+
+    def __init__(self, n_channels, window):
+        self.n_channels = n_channels
+        self.window = window
+        self.block = gcd(self.window, self.BLOCK)
+        self.n_blocks = self.window // self.block
+        self.points = np.zeros((self.n_channels, self.window))
+        self.pointer = 0 # Posicion donde se escribe la proxima muestra
+        self._sum = np.zeros(self.n_channels)
+        self._sum_sq = np.zeros(self.n_channels)
+        self._block_max = np.zeros((self.n_channels, self.n_blocks))
+        self._block_min = np.zeros((self.n_channels, self.n_blocks))
+        self._since_refresh = 0
+
+    def clear(self):
+        self.points[:] = 0
+        self.pointer = 0
+        self._refresh()
+
+    def _refresh(self):
+        """
+        Recalcula las sumas desde cero, para que no se acumule el error de
+        redondeo de las actualizaciones incrementales.
+        """
+        self._sum = self.points.sum(axis=1)
+        self._sum_sq = np.square(self.points).sum(axis=1)
+        self._since_refresh = 0
+
+    def _update_blocks(self, start, end):
+        first = start // self.block
+        last = (end - 1) // self.block + 1
+        blocks = self.points[:, first * self.block:last * self.block]
+        blocks = blocks.reshape(self.n_channels, last - first, self.block)
+
+        self._block_max[:, first:last] = blocks.max(axis=2)
+        self._block_min[:, first:last] = blocks.min(axis=2)
+
+    def _write(self, start, samples):
+        end = start + samples.shape[1]
+        old = self.points[:, start:end]
+
+        self._sum += samples.sum(axis=1) - old.sum(axis=1)
+        self._sum_sq += np.square(samples).sum(axis=1) - np.square(old).sum(axis=1)
+        self.points[:, start:end] = samples
+
+        self._update_blocks(start, end)
+
+    def extend(self, batch):
+        """
+        Agrega un lote de muestras de (n_samples, n_channels).
+        """
+        samples = np.asarray(batch[-self.window:], dtype=np.float64).T
+        n = samples.shape[1]
+        if n == 0:
+            return
+
+        first = min(n, self.window - self.pointer)
+
+        self._write(self.pointer, samples[:, :first])
+        if first < n:
+            self._write(0, samples[:, first:])
+        # El lote da la vuelta al final de la ventana
+
+        self.pointer = (self.pointer + n) % self.window
+
+        self._since_refresh += n
+        if self._since_refresh >= self.window:
+            self._refresh()
+
+    def ordered(self):
+        """
+        Devuelve una copia de la ventana ordenada cronologicamente.
+        """
+        return np.roll(self.points, -self.pointer, axis=1)
+
+    def maximum(self):
+        return self._block_max.max(axis=1)
+
+    def minimum(self):
+        return self._block_min.min(axis=1)
+
+    def mean(self):
+        return self._sum / self.window
+
+    def rms(self):
+        return np.sqrt(np.maximum(self._sum_sq / self.window, 0))
+
+    def get_measurements(self):
+        """
+        Devuelve un diccionario con Vp, Vpp, valor medio y valor eficaz
+        verdadero de cada canal.
+        """
+        maximum = self.maximum()
+
+        return {
+            "vp": maximum,
+            "vpp": maximum - self.minimum(),
+            "mean": self.mean(),
+            "vrms": self.rms(),
+        }
+
+class FrequencyEstimator(object):
+    """
+    Estima la frecuencia dominante de cada canal a partir de la ventana de
+    medicion. En lugar de calcular una FFT por muestra, la estimacion se
+    agenda cada "every_samples" muestras nuevas o cada "every_ms"
+    milisegundos (lo que ocurra primero), y entre tanto se devuelve el
+    ultimo valor calculado.
+
+    Todos los canales se transforman juntos con una sola "rfft" sobre el
+    arreglo de (n_channels, window), usando la ventana de Hann y el eje de
+    frecuencias precalculados. El pico se refina con una interpolacion
+    parabolica sobre el logaritmo del modulo.
+    """
+    def __init__(self, n_channels, window, sample_rate, every_samples=None, every_ms=None):
+        self.n_channels = n_channels
+        self.window = window
+        self.every_samples = every_samples
+        self.every_ms = every_ms
+        self.frequencies = np.zeros(self.n_channels)
+        self._taper = np.hanning(self.window)
+        self._pending = 0 # Muestras recibidas desde la ultima estimacion
+        self._last_time = 0
+
+        self.set_sample_rate(sample_rate)
+
+    def set_sample_rate(self, sample_rate):
+        """
+        Define la frecuencia de muestreo, en Hz, y recalcula el eje de
+        frecuencias.
+        """
+        self.sample_rate = sample_rate
+        self.bin_width = self.sample_rate / self.window
+        self.freqs = np.fft.rfftfreq(self.window, 1 / self.sample_rate)
+
+    def due(self, n_new):
+        """
+        Registra "n_new" muestras nuevas y devuelve True si corresponde
+        recalcular la estimacion.
+        """
+        self._pending += n_new
+
+        if self.every_samples is not None and self._pending >= self.every_samples:
+            return True
+
+        if self.every_ms is not None:
+            return (time.monotonic() - self._last_time) * 1000 >= self.every_ms
+
+        return self.every_samples is None
+        # Sin ninguna cadencia definida se estima siempre
+
+    def estimate(self, points):
+        """
+        Estima la frecuencia dominante de cada fila de "points", de
+        (n_channels, window) ordenado cronologicamente.
+        """
+        self._pending = 0
+        self._last_time = time.monotonic()
+
+        centered = points - points.mean(axis=1, keepdims=True)
+        # Se quita la continua para que no sea el pico dominante
+        magnitude = np.abs(np.fft.rfft(centered * self._taper, axis=1))
+        magnitude[:, 0] = 0
+
+        peak = magnitude.argmax(axis=1)
+        peak = np.clip(peak, 1, magnitude.shape[1] - 2)
+        rows = np.arange(self.n_channels)
+
+        neighbours = np.stack((peak - 1, peak, peak + 1))
+        left, center, right = np.log(magnitude[rows, neighbours] + 1e-12)
+        denominator = left - 2 * center + right
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = np.where(denominator != 0, 0.5 * (left - right) / denominator, 0)
+        delta = np.clip(delta, -0.5, 0.5)
+
+        frequencies = (peak + delta) * self.bin_width
+        frequencies[magnitude.max(axis=1) == 0] = 0
+        # Un canal sin señal no tiene frecuencia dominante
+
+        self.frequencies = frequencies
+
+        return self.frequencies
+
+    def update(self, stats, n_new):
+        """
+        Recalcula la estimacion sobre la ventana de "stats" (WindowStats)
+        solo si corresponde segun la cadencia. Devuelve la ultima estimacion.
+        """
+        if self.due(n_new):
+            self.estimate(stats.ordered())
+
+        return self.frequencies
+
+class MetricsPublisher(object):
+    """
+    Junta las ultimas mediciones y las entrega a los suscriptores a una
+    cadencia fija de "every_ms" milisegundos, legible para una persona,
+    en lugar de hacerlo con cada lote. Los valores se redondean a
+    "decimals" decimales y, con "only_changes", solo se publican si cambio
+    alguno de los valores redondeados, por lo que la interfaz no vuelve a
+    escribir etiquetas que muestran lo mismo.
+
+    Cada suscriptor recibe un diccionario con una lista de valores por
+    canal para cada clave, por ejemplo "vp", "vrms" o "freq".
+    """
+    def __init__(self, every_ms=250, decimals=2, only_changes=True):
+        self.every_ms = every_ms
+        self.decimals = decimals
+        self.only_changes = only_changes
+        self.values = dict() # Ultimas mediciones recibidas, sin redondear
+        self.published = None # Ultimo diccionario publicado
+        self._subscribers = list()
+        self._last_time = time.monotonic()
+
+    def subscribe(self, callback):
+        """
+        Registra "callback", que se invoca con cada publicacion.
+        """
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def update(self, values):
+        """
+        Actualiza las ultimas mediciones. Es barato, por lo que puede
+        invocarse con cada lote.
+        """
+        self.values.update(values)
+
+    def due(self):
+        return (time.monotonic() - self._last_time) * 1000 >= self.every_ms
+
+    def snapshot(self):
+        """
+        Devuelve las ultimas mediciones redondeadas, como listas.
+        """
+        return {
+            key: np.round(np.asarray(values, dtype=np.float64), self.decimals).tolist()
+            for key, values in self.values.items()
+        }
+
+    def publish(self, force=False):
+        """
+        Entrega las mediciones a los suscriptores si se cumplio la
+        cadencia, o siempre con "force". Devuelve True si se publico.
+        """
+        if not self.values or not (force or self.due()):
+            return False
+        self._last_time = time.monotonic()
+
+        metrics = self.snapshot()
+        if self.only_changes and not force and metrics == self.published:
+            return False
+        self.published = metrics
+
+        for callback in list(self._subscribers):
+            callback(metrics)
+
+        return True
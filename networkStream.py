@@ -0,0 +1,163 @@
+import socket
+
+class SocketStream(object):
+    """
+    Stream de red (TCP o UDP) con la misma interfaz que un puerto serie
+    (open, close, read, readinto, in_waiting y flushInput), para poder
+    usarlo con BasePlot. Las muestras tienen el mismo formato que por el
+    puerto serie.
+
+    El socket es no bloqueante: "in_waiting" vacia lo que el sistema ya
+    recibio (con UDP, todos los datagramas pendientes) dentro de un buffer
+    preasignado, sin crear objetos por lectura, y nunca espera datos
+    nuevos. El buffer de recepcion del sistema se agranda a "recv_buffer"
+    bytes para tolerar rafagas mientras la interfaz redibuja.
+
+    Con TCP se conecta a (host, port). Con UDP escucha en (host, port) y
+    conviene que cada datagrama contenga tramas completas, o usar el
+    protocolo con tramas para que un datagrama perdido no desfase los
+    canales.
+    """
+    TRANSPORTS = ("tcp", "udp")
+    RECV_BUFFER = 4 << 20
+    BUFFER_SIZE = 1 << 20 # Maximo de bytes acumulados sin leer
+    DATAGRAM_SIZE = 65536
+    CONNECT_TIMEOUT = 2.0
+
+    def __init__(self, host, port, transport="tcp", recv_buffer=None):
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+
+        self.host = host
+        self.port = port
+        self.transport = transport
+        self.recv_buffer = recv_buffer or self.RECV_BUFFER
+        self.is_open = False
+        self.peer = None # Direccion del ultimo datagrama recibido
+        self.peer_closed = False # El otro extremo cerro la conexion TCP
+        self._socket = None
+        self._buffer = bytearray(self.BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._start = 0 # Primer byte sin leer
+        self._fill = 0 # Fin de los bytes recibidos
+
+    def open(self):
+        if self.transport == "tcp":
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._socket.settimeout(self.CONNECT_TIMEOUT)
+            self._socket.connect((self.host, self.port))
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+            self._socket.bind((self.host, self.port))
+        # El buffer de recepcion se define antes de conectar
+
+        self._socket.setblocking(False)
+        self._start = self._fill = 0
+        self.peer_closed = False
+        self.is_open = True
+
+    def close(self):
+        if not self.is_open:
+            return
+
+        self._socket.close()
+        self._socket = None
+        self.is_open = False
+
+    def getsockname(self):
+        """
+        Devuelve la direccion local, util para conocer el puerto asignado
+        al escuchar en el puerto 0.
+        """
+        return self._socket.getsockname()
+
+    def _compact(self):
+        """
+        Mueve los bytes sin leer al comienzo del buffer.
+        """
+        pending = self._fill - self._start
+        if self._start:
+            self._view[:pending] = self._view[self._start:self._fill]
+        self._start = 0
+        self._fill = pending
+
+    def _drain(self):
+        """
+        Recibe todo lo disponible en el socket, sin bloquear, hasta llenar
+        el buffer.
+        """
+        if self._fill + self.DATAGRAM_SIZE > len(self._buffer):
+            self._compact()
+
+        minimum = self.DATAGRAM_SIZE if self.transport == "udp" else 1
+        # Con UDP solo se recibe si entra un datagrama completo
+
+        while len(self._buffer) - self._fill >= minimum:
+            target = self._view[self._fill:]
+            try:
+                if self.transport == "tcp":
+                    count = self._socket.recv_into(target)
+                    if count == 0:
+                        self.peer_closed = True
+                        self.close()
+                        break
+                else:
+                    count, self.peer = self._socket.recvfrom_into(target)
+            except (BlockingIOError, InterruptedError):
+                break
+
+            self._fill += count
+
+    @property
+    def in_waiting(self):
+        if self.is_open:
+            self._drain()
+
+        pending = self._fill - self._start
+        if not pending and self.peer_closed:
+            raise ConnectionError("Connection closed by peer")
+        # Lo recibido antes del cierre se entrega antes de informarlo
+
+        return pending
+
+    def readinto(self, b):
+        size = min(len(b), self._fill - self._start)
+        b[:size] = self._view[self._start:self._start + size]
+        self._start += size
+
+        if self._start == self._fill:
+            self._start = self._fill = 0
+
+        return size
+
+    def read(self, size=1):
+        data = bytearray(min(size, self.in_waiting))
+        self.readinto(data)
+
+        return bytes(data)
+
+    def write(self, data):
+        if self.transport == "tcp":
+            self._socket.sendall(data)
+        elif self.peer is not None:
+            self._socket.sendto(data, self.peer)
+        # Con UDP se responde al emisor del ultimo datagrama
+
+    def flushInput(self):
+        """
+        Descarta lo recibido y no leido, como un puerto serie.
+        """
+        while self.is_open:
+            self._start = self._fill = 0
+            self._drain()
+            if self._fill < len(self._buffer) - self.DATAGRAM_SIZE:
+                break
+        # Se repite solo si el buffer se lleno antes de vaciar el socket
+
+        self._start = self._fill = 0
+
+    def flushOutput(self):
+        pass
@@ -0,0 +1,241 @@
+import os, struct, time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from adcConverter import AdcConverter
+
+MAGIC = b"OSCRING1"
+VERSION = 2
+HEADER_FORMAT = "<8sHHIdqiiddqB"
+HEADER_SIZE = 128
+WRITE_INDEX_OFFSET = 24
+PENDING_INDEX_OFFSET = 56
+CLOSED_OFFSET = 64
+# magic, version, canales, capacidad en tramas, frecuencia de muestreo,
+# indice de escritura, IN_MIN, IN_MAX, OUT_MIN, OUT_MAX, indice pendiente
+# y marca de cierre. El indice de escritura es el total de tramas
+# publicadas; el pendiente, el total al terminar el lote que se esta
+# copiando. Ambos y la marca se actualizan por separado
+
+_published = set() # Segmentos creados por este proceso
+
+class SharedRingPublisher(object):
+    """
+    Publica las tramas uint16 decodificadas en un buffer circular de
+    memoria compartida ("multiprocessing.shared_memory"), para que otros
+    procesos locales sigan la misma adquisicion sin abrir el puerto.
+
+    El segmento tiene un encabezado de HEADER_SIZE bytes seguido de las
+    tramas, de (capacity, n_channels). "publish" anuncia primero en el
+    indice pendiente hasta donde va a escribir, copia el lote y recien
+    despues actualiza el indice de escritura; un lector compara su copia
+    con el indice pendiente y descarta las tramas que se sobrescribieron
+    mientras copiaba, por lo que nunca ve tramas a medio escribir. El
+    costo es una copia del lote, sin locks ni llamadas al sistema.
+    "close" marca el segmento como cerrado antes de liberarlo.
+    """
+    CAPACITY = 1 << 18
+
+    def __init__(self, n_channels, sample_rate, in_min, in_max, out_min, out_max, name=None, capacity=None):
+        self.n_channels = n_channels
+        self.capacity = capacity or self.CAPACITY
+        size = HEADER_SIZE + 2 * self.capacity * self.n_channels
+
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self._shm.name
+        _published.add(self.name)
+        struct.pack_into(
+            HEADER_FORMAT, self._shm.buf, 0,
+            MAGIC, VERSION, self.n_channels, self.capacity, sample_rate,
+            0, in_min, in_max, out_min, out_max, 0, 0,
+        )
+        self._write_index = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf, offset=WRITE_INDEX_OFFSET)
+        self._pending_index = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf, offset=PENDING_INDEX_OFFSET)
+        self._data = np.ndarray((self.capacity, self.n_channels), dtype=np.uint16, buffer=self._shm.buf, offset=HEADER_SIZE)
+        self.total = 0 # Tramas publicadas
+
+    def publish(self, frames):
+        """
+        Agrega un lote de tramas de (n_frames, n_channels).
+        """
+        count = len(frames)
+        frames = frames[-self.capacity:]
+        n = len(frames)
+        start = (self.total + count - n) % self.capacity
+        # Si el lote no entra, se conservan sus ultimas tramas
+        first = min(n, self.capacity - start)
+
+        self._pending_index[0] = self.total + count
+        # Antes de sobrescribir, se anuncia hasta donde llega el lote
+
+        self._data[start:start + first] = frames[:first]
+        self._data[:n - first] = frames[first:]
+
+        self.total += count
+        self._write_index[0] = self.total
+        # Se publica el indice una vez copiados los datos
+
+    def close(self):
+        """
+        Libera el segmento. Los lectores que lo tengan mapeado dejan de
+        recibir tramas nuevas y ven la marca de cierre.
+        """
+        if self._shm is None:
+            return
+
+        self._shm.buf[CLOSED_OFFSET] = 1
+        del self._write_index, self._pending_index, self._data
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+        _published.discard(self.name)
+
+def _attach(name):
+    """
+    Mapea un segmento existente sin registrarlo para su borrado al
+    terminar el proceso, que le corresponde solo al publicador.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # "track" existe desde Python 3.13
+
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name != "posix" or name in _published or multiprocessing.parent_process() is not None:
+        return shm
+    # Solo en POSIX se registra el segmento. El registro del publicador se
+    # conserva si es del mismo proceso o de uno lanzado con
+    # multiprocessing, que comparte su resource_tracker
+
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister("/" + shm.name, "shared_memory")
+    # El resource_tracker registra el nombre con la barra inicial de POSIX
+
+    return shm
+
+class SharedRingReader(object):
+    """
+    Lector de un buffer publicado por SharedRingPublisher, desde otro
+    proceso. El segmento se mapea sin copiar; "frames" es una vista del
+    buffer completo y "pop" copia las tramas nuevas desde la ultima
+    lectura. Si el lector se atrasa mas que la capacidad del buffer, las
+    tramas sobrescritas se cuentan en "lost". "closed" indica que el
+    publicador libero el segmento.
+
+        reader = SharedRingReader(name)
+        while reader.wait():
+            volts = reader.to_volts(reader.pop())
+    """
+    def __init__(self, name, from_start=False):
+        self.name = name
+        self._shm = _attach(name)
+
+        fields = struct.unpack_from(HEADER_FORMAT, self._shm.buf, 0)
+        if fields[0] != MAGIC:
+            self._shm.close()
+            raise ValueError("Not an oscilloscope shared ring")
+        if fields[1] != VERSION:
+            self._shm.close()
+            raise ValueError(f"Unsupported shared ring version: {fields[1]}")
+
+        self.header = {
+            "version": fields[1],
+            "n_channels": fields[2],
+            "capacity": fields[3],
+            "sample_rate": fields[4],
+            "in_min": fields[6],
+            "in_max": fields[7],
+            "out_min": fields[8],
+            "out_max": fields[9],
+        }
+        self.n_channels = self.header["n_channels"]
+        self.capacity = self.header["capacity"]
+        self.sample_rate = self.header["sample_rate"]
+        self._write_index = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf, offset=WRITE_INDEX_OFFSET)
+        self._pending_index = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf, offset=PENDING_INDEX_OFFSET)
+        self.frames = np.ndarray((self.capacity, self.n_channels), dtype=np.uint16, buffer=self._shm.buf, offset=HEADER_SIZE)
+        self.lost = 0 # Tramas sobrescritas antes de leerlas
+        self._converter = None
+
+        self.read_index = 0 if from_start else self.write_index()
+        # Por defecto se siguen solo las tramas nuevas
+
+    def write_index(self):
+        return int(self._write_index[0])
+
+    @property
+    def closed(self):
+        """
+        True si el publicador cerro el segmento.
+        """
+        return self._shm is None or self._shm.buf[CLOSED_OFFSET] != 0
+
+    def available(self):
+        return self.write_index() - self.read_index
+
+    def pop(self, max_frames=None):
+        """
+        Devuelve una copia de las tramas nuevas, de (n_frames, n_channels),
+        y avanza el indice de lectura.
+        """
+        end = self.write_index()
+        start = max(self.read_index, end - self.capacity)
+        if max_frames is not None:
+            end = min(end, start + max_frames)
+        self.lost += start - self.read_index
+
+        n = end - start
+        first_index = start % self.capacity
+        first = min(n, self.capacity - first_index)
+        frames = np.concatenate((self.frames[first_index:first_index + first], self.frames[:n - first]))
+
+        overwritten = int(self._pending_index[0]) - self.capacity - start
+        if overwritten > 0:
+            frames = frames[overwritten:]
+            self.lost += overwritten
+        # El publicador pudo sobrescribir el comienzo durante la copia,
+        # incluso con un lote que todavia no publico
+
+        self.read_index = end
+
+        return frames
+
+    def wait(self, timeout=None, interval=0.001):
+        """
+        Espera hasta que haya tramas nuevas, se cumpla "timeout" segundos o
+        el publicador cierre el segmento. Devuelve True si hay tramas
+        nuevas.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.available():
+            if self.closed:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+        return True
+
+    def to_volts(self, frames):
+        """
+        Convierte tramas a tension con las escalas del publicador.
+        """
+        if self._converter is None:
+            self._converter = AdcConverter(
+                self.n_channels,
+                self.header["in_min"],
+                self.header["in_max"],
+                self.header["out_min"],
+                self.header["out_max"]
+            )
+
+        return self._converter.convert(frames)
+
+    def close(self):
+        if self._shm is None:
+            return
+
+        del self._write_index, self._pending_index, self.frames
+        self._shm.close()
+        self._shm = None
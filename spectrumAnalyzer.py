@@ -0,0 +1,163 @@
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+class SpectrumAnalyzer(object):
+    """
+    Espectro promediado de cada canal, en dBV (amplitud de pico), con su
+    eje de frecuencias en Hz segun la frecuencia de muestreo.
+
+    Las muestras se acumulan en un arreglo circular con "extend", que solo
+    copia el lote. El espectro se calcula con "compute" cuando "due" lo
+    indica (cada "every_ms" milisegundos), con una sola "rfft" sobre todos
+    los canales y segmentos a la vez y la ventana precalculada, por lo que
+    el costo por cuadro esta acotado y no depende de las muestras
+    recibidas.
+
+    Promedios ("averaging"):
+
+    - "none": el espectro del ultimo segmento de "size" muestras.
+    - "exponential": promedio exponencial de la potencia, con peso "alpha"
+      para el espectro nuevo.
+    - "welch": promedio de "segments" segmentos superpuestos en
+      "overlap", sobre las ultimas muestras.
+
+    Ademas se llevan dos trazas de retencion: "max_hold", el maximo de
+    cada frecuencia desde el ultimo "reset_hold", y "peak_hold", que sigue
+    los maximos y decae "peak_decay" dB por segundo.
+    """
+    WINDOWS = {
+        "hann": np.hanning,
+        "hamming": np.hamming,
+        "blackman": np.blackman,
+        "rect": np.ones,
+    }
+    AVERAGING = ("none", "exponential", "welch")
+    FLOOR_DB = -200 # Piso para el logaritmo de un espectro nulo
+
+    def __init__(self, n_channels, size, sample_rate, window="hann", averaging="exponential",
+                 alpha=0.25, segments=8, overlap=0.5, every_ms=100, peak_decay=20):
+        if window not in self.WINDOWS:
+            raise ValueError(f"Unknown window: {window}")
+        if averaging not in self.AVERAGING:
+            raise ValueError(f"Unknown averaging: {averaging}")
+
+        self.n_channels = n_channels
+        self.size = size
+        self.averaging = averaging
+        self.alpha = alpha
+        self.every_ms = every_ms
+        self.peak_decay = peak_decay
+        self.window_name = window
+        self._taper = self.WINDOWS[window](self.size)
+        scale = np.full(self.size // 2 + 1, (2 / self._taper.sum()) ** 2)
+        scale[0] /= 4
+        if self.size % 2 == 0:
+            scale[-1] /= 4
+        self._scale = scale
+        # Potencia de cada bin como amplitud de pico al cuadrado; la
+        # continua y Nyquist no se reparten con frecuencias negativas
+
+        self.hop = max(int(self.size * (1 - overlap)), 1)
+        self.segments = segments if averaging == "welch" else 1
+        self.history = self.size + (self.segments - 1) * self.hop
+        self.points = np.zeros((self.n_channels, self.history))
+        self.pointer = 0 # Posicion donde se escribe la proxima muestra
+        self._pending = 0 # Muestras recibidas desde el ultimo calculo
+        self._last_time = 0
+
+        self.set_sample_rate(sample_rate)
+
+    def set_sample_rate(self, sample_rate):
+        """
+        Define la frecuencia de muestreo, en Hz, y recalcula el eje de
+        frecuencias. Los promedios se reinician.
+        """
+        self.sample_rate = sample_rate
+        self.freqs = np.fft.rfftfreq(self.size, 1 / self.sample_rate)
+        self.reset()
+
+    def reset(self):
+        """
+        Descarta los promedios y las trazas de retencion.
+        """
+        self.power = None # Potencia promediada, de (n_channels, bins)
+        self.db = None
+        self.reset_hold()
+
+    def reset_hold(self):
+        self.max_hold = None
+        self.peak_hold = None
+
+    def extend(self, batch):
+        """
+        Agrega un lote de muestras de (n_samples, n_channels).
+        """
+        samples = np.asarray(batch[-self.history:], dtype=np.float64).T
+        n = samples.shape[1]
+        if n == 0:
+            return
+
+        first = min(n, self.history - self.pointer)
+        self.points[:, self.pointer:self.pointer + first] = samples[:, :first]
+        self.points[:, :n - first] = samples[:, first:]
+        # El lote da la vuelta al final del arreglo
+
+        self.pointer = (self.pointer + n) % self.history
+        self._pending += n
+
+    def due(self):
+        """
+        Devuelve True si hay muestras nuevas y se cumplio la cadencia.
+        """
+        if not self._pending:
+            return False
+
+        return (time.monotonic() - self._last_time) * 1000 >= self.every_ms
+
+    def _to_db(self, power):
+        return np.maximum(10 * np.log10(power + 1e-30), self.FLOOR_DB)
+
+    def compute(self):
+        """
+        Calcula el espectro con las ultimas muestras y actualiza los
+        promedios y las trazas de retencion. Devuelve el espectro en dBV,
+        de (n_channels, bins).
+        """
+        self._pending = 0
+
+        points = np.concatenate((self.points[:, self.pointer:], self.points[:, :self.pointer]), axis=1)
+        segments = sliding_window_view(points, self.size, axis=1)[:, ::self.hop]
+        # De (n_channels, segments, size), sin copiar las muestras
+
+        spectrum = np.fft.rfft(segments * self._taper, axis=2)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) * self._scale
+        power = power.mean(axis=1)
+
+        if self.averaging == "exponential" and self.power is not None:
+            self.power += self.alpha * (power - self.power)
+        else:
+            self.power = power
+
+        return self.load(self._to_db(self.power))
+
+    def load(self, db):
+        """
+        Toma "db" como el espectro actual, ya promediado (por ejemplo el
+        calculado en el proceso de DSP), y actualiza las trazas de
+        retencion. Devuelve "db".
+        """
+        now = time.monotonic()
+        elapsed = now - self._last_time if self._last_time else 0
+        self._last_time = now
+
+        self.db = db
+
+        if self.max_hold is None:
+            self.max_hold = self.db.copy()
+            self.peak_hold = self.db.copy()
+        else:
+            np.maximum(self.max_hold, self.db, out=self.max_hold)
+            self.peak_hold = np.maximum(self.peak_hold - self.peak_decay * elapsed, self.db)
+
+        return self.db
@@ -0,0 +1,5 @@
+import os, sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Los modulos del osciloscopio estan en la raiz del repositorio
@@ -0,0 +1,36 @@
+import numpy as np
+
+from acquisition import SampleRing, MultiSourceAcquisition
+
+def test_ring_keeps_batch_timestamps():
+    ring = SampleRing(8, 1, timestamps=True)
+    ring.push(np.zeros((3, 1), dtype=np.uint16), 1.0)
+    ring.push(np.zeros((3, 1), dtype=np.uint16), 2.0)
+    ring.pop(2)
+    ring.push(np.zeros((3, 1), dtype=np.uint16), 3.0)
+    # La ultima escritura da la vuelta al final del buffer
+
+    frames, times = ring.pop_timed()
+
+    assert len(frames) == 7
+    assert times.tolist() == [1.0, 2.0, 2.0, 2.0, 3.0, 3.0, 3.0]
+
+def test_merged_frames_carry_per_source_times():
+    acquisition = MultiSourceAcquisition([(None, Decoder(1)), (None, Decoder(2))], 100, 64, max_lag=2)
+    first, second = acquisition.rings
+
+    first.push(np.full((5, 1), 1, dtype=np.uint16), 10.0)
+    second.push(np.full((2, 2), 2, dtype=np.uint16), 20.0)
+
+    frames, missing, times = acquisition.pop()
+
+    assert frames.shape == (3, 3)
+    assert times[:, 0].tolist() == [10.0, 10.0, 10.0]
+    assert times[:2, 1].tolist() == [20.0, 20.0]
+    assert np.isnan(times[2, 1])
+    assert missing[2, 1:].all()
+    # La tercera fila de la segunda fuente se completo, no tiene instante
+
+class Decoder(object):
+    def __init__(self, n_channels):
+        self.n_channels = n_channels
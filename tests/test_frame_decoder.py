@@ -0,0 +1,30 @@
+import numpy as np
+
+from frameDecoder import FramedDecoder, crc16, encode_frames
+
+def test_framed_drops_out_of_range_values():
+    decoder = FramedDecoder(2, 0, 4095)
+    data = encode_frames(np.array([[1, 2], [4095, 5000], [3, 4]], dtype=np.uint16))
+
+    frames, resync = decoder.decode(data)
+
+    assert frames.tolist() == [[1, 2], [3, 4]]
+    assert decoder.invalid_frames == 1
+    assert not resync
+
+def test_false_sync_does_not_drop_the_next_frame():
+    frames = np.array([[FramedDecoder.SYNC_WORD, 201], [10, 20], [30, 40]], dtype=np.uint16)
+    data = encode_frames(frames, sequence=231)
+    # Con estos valores, los bytes desde el primer canal de la primera
+    # trama tambien forman una trama con CRC valido, superpuesta con la
+    # segunda
+
+    false = np.frombuffer(data[4:14], dtype="<u2")
+    assert false[0] == FramedDecoder.SYNC_WORD
+    assert crc16(np.frombuffer(data[6:12], dtype=np.uint8)[None])[0] == false[-1]
+
+    decoder = FramedDecoder(2, 0, 65535)
+    decoded, _ = decoder.decode(data)
+
+    assert decoded.tolist() == frames.tolist()
+    assert decoder.lost_frames == 0
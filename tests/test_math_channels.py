@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from mathChannels import MathChannel
+
+VOLTS = np.array([[1.0, 2.0], [3.0, -4.0]])
+
+@pytest.mark.parametrize("expression", ["min(A)", "abs()", "sqrt(A, B)", "A(B)", "C + 1"])
+def test_invalid_expressions_are_rejected(expression):
+    math = MathChannel(2)
+    with pytest.raises(ValueError):
+        math.compile(expression)
+
+@pytest.mark.parametrize("expression", ["1/0", "0%0", "A/0", "2**1000"])
+def test_constant_errors_give_nan(expression):
+    math = MathChannel(2)
+    math.compile(expression)
+    assert np.isnan(math.compute(VOLTS)).all()
+
+def test_expression_result():
+    math = MathChannel(2)
+    math.compile("(A - B) * 0.5 + max(A, B)")
+    np.testing.assert_allclose(math.compute(VOLTS), [1.5, 6.5])
+
+def test_compute_failure_gives_nan():
+    math = MathChannel(2)
+    math.compile("A + B")
+    assert np.isnan(math.compute(np.zeros((3, 1)))).all()
+    # Lote con menos canales que los de la expresion
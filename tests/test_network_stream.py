@@ -0,0 +1,118 @@
+import socket, threading, time
+import numpy as np
+import pytest
+
+from frameDecoder import FrameDecoder
+from networkStream import SocketStream
+
+def payload(n_frames=20000):
+    return (np.arange(2 * n_frames) % 4096).astype("<u2").tobytes()
+
+def read_all(stream, size, timeout=5.0):
+    """
+    Decodifica lo recibido hasta juntar "size" bytes o agotar el tiempo.
+    """
+    decoder = FrameDecoder(2, 0, 4095)
+    frames = list()
+    deadline = time.monotonic() + timeout
+    received = 0
+    while received < size and time.monotonic() < deadline:
+        received += decoder.read_from(stream, 100)
+        batch, resync = decoder.decode()
+        assert not resync
+        frames.append(batch)
+
+    return np.concatenate(frames)
+
+def test_tcp_loopback():
+    data = payload()
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def serve():
+        connection, _ = server.accept()
+        for i in range(0, len(data), 4001):
+            connection.sendall(data[i:i + 4001])
+        # Bloques que no coinciden con el tamaño de la trama
+        connection.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+
+    stream = SocketStream("127.0.0.1", server.getsockname()[1], "tcp")
+    stream.open()
+    frames = read_all(stream, len(data))
+    thread.join()
+    stream.close()
+    server.close()
+
+    assert frames.tobytes() == data
+
+def test_udp_loopback():
+    data = payload(4000)
+    stream = SocketStream("127.0.0.1", 0, "udp")
+    stream.open()
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for i in range(0, len(data), 4000):
+        sender.sendto(data[i:i + 4000], stream.getsockname())
+
+    frames = read_all(stream, len(data))
+    stream.flushInput()
+    assert stream.in_waiting == 0
+    stream.close()
+    sender.close()
+
+    assert frames.tobytes() == data
+
+def test_flush_after_peer_closed():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    stream = SocketStream("127.0.0.1", server.getsockname()[1], "tcp")
+    stream.open()
+    connection, _ = server.accept()
+    connection.close()
+    time.sleep(0.05)
+
+    stream.flushInput()
+    stream.close()
+    server.close()
+
+class App(object):
+    def exec_(self):
+        pass
+
+    def exit(self):
+        pass
+
+class Panel(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+def test_unthreaded_plot_stops_when_peer_closes():
+    QtWidgets = pytest.importorskip("pyqtgraph.Qt").QtWidgets
+    from SoftOscilloscope import NetworkPlot
+    qapp = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    plot = NetworkPlot(App(), "127.0.0.1", server.getsockname()[1], 2, threaded=False)
+    plot.set_button_panel(Panel())
+    plot.start()
+    connection, _ = server.accept()
+    connection.sendall(payload(100))
+    connection.close()
+    time.sleep(0.05)
+
+    for _ in range(100):
+        plot._read_stream()
+    # Sin la conexion, cada lectura lanzaria ConnectionError
+
+    assert not plot.timer.isActive()
+    plot._close()
+    server.close()
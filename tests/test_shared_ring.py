@@ -0,0 +1,39 @@
+import numpy as np
+
+from sharedRing import SharedRingPublisher, SharedRingReader
+
+def make_ring(capacity=8):
+    publisher = SharedRingPublisher(1, 1000, 0, 4095, -3.6, 3.4, capacity=capacity)
+    reader = SharedRingReader(publisher.name, from_start=True)
+    return publisher, reader
+
+def test_pop_drops_frames_of_a_publish_in_progress():
+    publisher, reader = make_ring()
+    try:
+        publisher.publish(np.ones((8, 1), dtype=np.uint16))
+
+        publisher._pending_index[0] = 16
+        publisher._data[:4] = 2
+        # Un segundo lote escribio 4 tramas sin publicar el indice
+
+        frames = reader.pop()
+
+        assert (frames == 1).all()
+        assert len(frames) + reader.lost == 8
+    finally:
+        reader.close()
+        publisher.close()
+
+def test_wait_returns_false_after_close():
+    publisher, reader = make_ring()
+    try:
+        publisher.publish(np.arange(4, dtype=np.uint16)[:, None])
+        publisher.close()
+
+        assert reader.closed
+        assert reader.wait()
+        assert reader.pop()[:, 0].tolist() == [0, 1, 2, 3]
+        assert not reader.wait()
+    finally:
+        reader.close()
+        publisher.close()
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+QtWidgets = pytest.importorskip("pyqtgraph.Qt").QtWidgets
+from SoftOscilloscope import BasePlot
+
+class ChunkStream(object):
+    """
+    Stream que solo entrega lo que se le agrego con "feed", como un
+    puerto serie que recibe pocas tramas por lectura.
+    """
+    def __init__(self):
+        self.data = bytearray()
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def feed(self, data):
+        self.data += data
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size=1):
+        data = bytes(self.data[:size])
+        del self.data[:size]
+        return data
+
+    def flushInput(self):
+        self.data.clear()
+
+class Panel(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+class App(object):
+    def exec_(self):
+        pass
+
+    def exit(self):
+        pass
+
+@pytest.fixture(scope="module")
+def qapp():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+def sine_bytes(n, frequency=50, sample_rate=10000):
+    t = np.arange(n) / sample_rate
+    channel = 2048 + 1500 * np.sin(2 * np.pi * frequency * t)
+    return np.column_stack((channel, channel)).astype("<u2").tobytes()
+
+@pytest.mark.parametrize("time_range", [10, 1000, 4000, 5000])
+def test_normal_trigger_locks_at_every_time_base(qapp, time_range):
+    stream = ChunkStream()
+    plot = BasePlot(App(), stream, 2, xlim=7001)
+    plot.set_button_panel(Panel())
+    plot.start()
+    plot.change_time(time_range)
+    plot.set_trigger_mode("Normal")
+
+    data = sine_bytes(20000)
+    batch = 10 * 4 # 10 tramas de 2 canales
+    for i in range(0, len(data), batch):
+        stream.feed(data[i:i + batch])
+        plot._read_stream()
+        if i % (33 * batch) == 0:
+            plot.next_render = 0
+            plot._render()
+    # Un cuadro cada 330 muestras, como a 30 fps con 10kS/s
+
+    assert plot.trigger_version > 1
+    assert plot.trigger_snapshot is not None
+    plot._close()
@@ -0,0 +1,118 @@
+import numpy as np
+
+class TraceBuffer(object):
+    """
+    Buffer circular preasignado con las ultimas "length" muestras de cada
+    canal. Cada muestra se escribe dos veces (en "i" y en "i + length"),
+    de forma que la traza ordenada cronologicamente siempre es una vista
+    contigua del arreglo, sin necesidad de copiarla ni rotarla.
+    """
+    def __init__(self, n_channels, length, dtype=np.float32):
+        self.n_channels = n_channels
+        self.length = length
+        self.x = np.arange(self.length)
+        # Eje X compartido por todas las trazas
+        self.total = 0 # Cantidad de muestras recibidas desde el inicio
+        self.version = 0 # Cambia con cada modificacion de los datos
+        self._data = np.zeros((self.n_channels, 2 * self.length), dtype=dtype)
+        self._head = 0 # Posicion de la muestra mas antigua
+
+    def clear(self):
+        self._data[:] = 0
+        self._head = 0
+        self.total = 0
+        self.version += 1
+
+    def _write(self, start, samples):
+        end = start + samples.shape[1]
+        self._data[:, start:end] = samples
+        self._data[:, start + self.length:end + self.length] = samples
+
+    def extend(self, batch):
+        """
+        Agrega un lote de muestras de (n_samples, n_channels) con una
+        escritura por tramo, en lugar de desplazar la traza por cada muestra.
+        """
+        self.total += len(batch)
+
+        samples = batch[-self.length:].T
+        n = samples.shape[1]
+        first = min(n, self.length - self._head)
+
+        self._write(self._head, samples[:, :first])
+        if first < n:
+            self._write(0, samples[:, first:])
+        # El lote da la vuelta al final del buffer
+
+        self._head = (self._head + n) % self.length
+        self.version += 1
+
+    def channel(self, index):
+        """
+        Devuelve la traza ordenada del canal, de la mas antigua a la mas
+        reciente. Es una vista que se modifica con cada lote nuevo.
+        """
+        return self._data[index, self._head:self._head + self.length]
+
+    def channels(self):
+        """
+        Devuelve las trazas ordenadas de todos los canales.
+        """
+        return self._data[:, self._head:self._head + self.length]
+
+def minmax_envelope(x, y, columns):
+    """
+    Reduce la traza a una envolvente de minimos y maximos con "columns"
+    columnas: por cada columna se conservan el minimo y el maximo de las
+    muestras que caen en ella, por lo que un pico aislado sigue siendo
+    visible. Las muestras NaN se ignoran. Si la traza ya tiene pocas
+    muestras se devuelve sin cambios.
+    """
+    n = len(y)
+    if n <= 2 * columns:
+        return x, y
+
+    edges = np.linspace(0, n, columns + 1).astype(np.intp)
+    starts = edges[:-1]
+    middles = (edges[:-1] + edges[1:]) // 2
+
+    envelope_x = np.empty(2 * columns, dtype=x.dtype)
+    envelope_y = np.empty(2 * columns, dtype=y.dtype)
+    envelope_x[0::2] = x[starts]
+    envelope_x[1::2] = x[middles]
+    envelope_y[0::2] = np.fmin.reduceat(y, starts)
+    envelope_y[1::2] = np.fmax.reduceat(y, starts)
+
+    return envelope_x, envelope_y
+
+class EnvelopeDecimator(object):
+    """
+    Calcula la envolvente de la parte visible de una traza, con una
+    columna por pixel de ancho. El resultado se guarda y solo se recalcula
+    cuando cambian los datos, el rango visible o el ancho en pixeles.
+    """
+    def __init__(self):
+        self._key = None
+
+    def invalidate(self):
+        self._key = None
+
+    def decimate(self, x, y, version, x_range, width):
+        """
+        Devuelve la tupla (x, y) a dibujar, o None si no hubo cambios desde
+        la ultima llamada. "x" debe avanzar de a una unidad por muestra,
+        aunque puede estar desplazado.
+        """
+        offset = x[0] if len(x) else 0
+        start = max(0, int(np.floor(x_range[0] - offset)))
+        stop = min(len(y), int(np.ceil(x_range[1] - offset)) + 1)
+        key = (version, offset, start, stop, width)
+
+        if key == self._key:
+            return None
+        self._key = key
+
+        if stop <= start:
+            return x[:0], y[:0]
+
+        return minmax_envelope(x[start:stop], y[start:stop], width)
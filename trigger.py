@@ -0,0 +1,164 @@
+import numpy as np
+
+class EdgeTrigger(object):
+    """
+    Disparo por flanco con nivel, histeresis y holdoff. Cada lote se
+    analiza completo con NumPy: las muestras se clasifican por debajo de
+    la banda de histeresis (-1), por encima del nivel (+1) o dentro de la
+    banda (0), los ceros se completan con el ultimo estado conocido y un
+    disparo es cada paso de -1 a +1. El estado se conserva entre lotes, por
+    lo que un flanco partido entre dos lecturas tambien se detecta.
+
+    En flanco descendente se aplica lo mismo sobre la señal invertida.
+    """
+    RISING = "rising"
+    FALLING = "falling"
+
+    def __init__(self, level=0.0, slope=RISING, hysteresis=0.05, holdoff=0):
+        self.level = level
+        self.slope = slope
+        self.hysteresis = hysteresis
+        self.holdoff = holdoff # Muestras minimas entre disparos
+        self.reset()
+
+    def reset(self):
+        self._state = 0
+        self._last_event = None
+
+    def configure(self, level=None, slope=None, hysteresis=None, holdoff=None):
+        if level is not None:
+            self.level = level
+        if slope is not None:
+            if slope not in (self.RISING, self.FALLING):
+                raise ValueError(f"Unknown slope: {slope}")
+            self.slope = slope
+        if hysteresis is not None:
+            self.hysteresis = abs(hysteresis)
+        if holdoff is not None:
+            self.holdoff = holdoff
+
+    def scan(self, samples, start_index):
+        """
+        Busca disparos en "samples" (1-D), cuya primera muestra tiene el
+        indice absoluto "start_index". Devuelve los indices absolutos de
+        los disparos encontrados.
+        """
+        n = len(samples)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        if self.slope == self.RISING:
+            x = samples
+            level = self.level
+        else:
+            x = -samples
+            level = -self.level
+
+        state = np.zeros(n, dtype=np.int8)
+        state[x < level - self.hysteresis] = -1
+        state[x >= level] = 1
+
+        known = np.where(state != 0, np.arange(n), -1)
+        np.maximum.accumulate(known, out=known)
+        filled = np.where(known >= 0, state[known], self._state)
+        # Dentro de la banda se mantiene el ultimo estado conocido
+
+        previous = np.empty(n, dtype=np.int8)
+        previous[0] = self._state
+        previous[1:] = filled[:-1]
+        self._state = filled[-1]
+
+        events = np.flatnonzero((previous == -1) & (filled == 1)) + start_index
+
+        if self.holdoff > 0 and len(events):
+            kept = list()
+            last = self._last_event
+            for event in events.tolist():
+                if last is None or event - last >= self.holdoff:
+                    kept.append(event)
+                    last = event
+            events = np.array(kept, dtype=np.int64)
+            # Quedan pocos candidatos, por lo que se recorren en Python
+
+        if len(events):
+            self._last_event = int(events[-1])
+
+        return events
+
+class MemoryCapture(object):
+    """
+    Captura de un transitorio contada en muestras. Mientras la señal del
+    canal de origen esta dentro de la banda de ruido, las ultimas
+    "pre_samples" muestras se guardan en un historial circular; cuando una
+    muestra sale de la banda se toman "post_samples" muestras mas a partir
+    de ella. El registro final contiene el historial previo seguido de las
+    muestras posteriores, de forma que no se pierde el inicio del
+    transitorio.
+    """
+    def __init__(self, n_channels, pre_samples, post_samples, noise_band, source=0):
+        self.n_channels = n_channels
+        self.pre_samples = pre_samples
+        self.post_samples = post_samples
+        self.noise_band = noise_band
+        self.source = source
+        self.triggered = False
+        self.record = None # (n_samples, n_channels) una vez completo
+        self.trigger_index = 0 # Posicion del disparo dentro del registro
+        self._history = np.zeros((self.pre_samples, self.n_channels), dtype=np.float32)
+        self._history_pointer = 0
+        self._history_fill = 0
+        self._post = np.zeros((self.post_samples, self.n_channels), dtype=np.float32)
+        self._post_fill = 0
+
+    def is_complete(self):
+        return self.record is not None
+
+    def _remember(self, volts):
+        """
+        Agrega un lote al historial previo al disparo.
+        """
+        volts = volts[len(volts) - min(len(volts), self.pre_samples):]
+        n = len(volts)
+        if n == 0:
+            return
+
+        first = min(n, self.pre_samples - self._history_pointer)
+        self._history[self._history_pointer:self._history_pointer + first] = volts[:first]
+        self._history[:n - first] = volts[first:]
+
+        self._history_pointer = (self._history_pointer + n) % self.pre_samples
+        self._history_fill = min(self._history_fill + n, self.pre_samples)
+
+    def feed(self, volts):
+        """
+        Procesa un lote de (n_samples, n_channels) tensiones. Devuelve True
+        cuando el registro esta completo.
+        """
+        if self.record is not None:
+            return True
+
+        if not self.triggered:
+            outside = np.abs(volts[:, self.source]) > self.noise_band
+            if not outside.any():
+                self._remember(volts)
+                return False
+            # Todo el lote esta dentro de la banda de ruido
+
+            start = int(outside.argmax())
+            self._remember(volts[:start])
+            volts = volts[start:]
+            self.triggered = True
+
+        n = min(len(volts), self.post_samples - self._post_fill)
+        self._post[self._post_fill:self._post_fill + n] = volts[:n]
+        self._post_fill += n
+
+        if self._post_fill < self.post_samples:
+            return False
+
+        history = np.roll(self._history, -self._history_pointer, axis=0)
+        history = history[self.pre_samples - self._history_fill:]
+        self.record = np.concatenate((history, self._post))
+        self.trigger_index = len(history)
+
+        return True